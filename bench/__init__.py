@@ -0,0 +1,3 @@
+"""
+离线基准测试套件,使用方法见 run.py
+"""
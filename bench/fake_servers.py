@@ -0,0 +1,276 @@
+"""
+本地假服务器模块
+在本机上模拟 Minecraft Java 版和 Bedrock 版服务器,供基准测试使用,不需要访问外网
+
+- FakeJavaServer: TCP 服务器,实现 Server List Ping(握手、状态请求、Ping)
+- FakeBedrockServer: UDP 服务器,实现 RakNet 未连接 Ping(Unconnected Ping/Pong)
+
+两者都可以配置:
+- delay: 每次响应前的延迟(秒)
+- icon_size: 图标数据的字节数,为 0 时不返回图标(仅 Java 版)
+- player_sample: 玩家列表中的玩家数量(仅 Java 版)
+- failure: 失败模式,见 FAILURE_MODES
+- failure_rate: 按此比例随机触发失败模式,为 1 时每次都失败
+"""
+
+import asyncio
+import base64
+import json
+import random
+import struct
+import uuid
+from typing import Optional
+
+# 失败模式:
+# none    - 正常响应
+# timeout - 收到请求后不响应
+# close   - 收到请求后直接断开连接(Bedrock 版等同于 timeout)
+# garbage - 返回无法解析的数据
+FAILURE_MODES = ("none", "timeout", "close", "garbage")
+
+# RakNet 离线消息标识
+RAKNET_MAGIC = bytes.fromhex("00ffff00fefefefefdfdfdfd12345678")
+
+
+def _should_fail(failure: str, failure_rate: float) -> bool:
+    return failure != "none" and random.random() < failure_rate
+
+
+def _encode_varint(value: int) -> bytes:
+    value &= 0xFFFFFFFF
+    out = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+async def _read_varint(reader: asyncio.StreamReader) -> int:
+    result = 0
+    for shift in range(0, 35, 7):
+        byte = (await reader.readexactly(1))[0]
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result
+    raise ValueError("VarInt 过长")
+
+
+def _encode_packet(packet_id: int, payload: bytes) -> bytes:
+    body = _encode_varint(packet_id) + payload
+    return _encode_varint(len(body)) + body
+
+
+def _encode_string(value: str) -> bytes:
+    data = value.encode("utf-8")
+    return _encode_varint(len(data)) + data
+
+
+def make_icon(size: int) -> Optional[str]:
+    """生成指定字节数的图标 data URI,内容固定,便于比较"""
+    if size <= 0:
+        return None
+    data = (b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * (size // 256 + 1))[:size]
+    return "data:image/png;base64," + base64.b64encode(data).decode("ascii")
+
+
+class FakeJavaServer:
+    """模拟 Java 版 Server List Ping 的 TCP 服务器"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        delay: float = 0.0,
+        icon_size: int = 0,
+        player_sample: int = 0,
+        players_online: int = 20,
+        players_max: int = 100,
+        motd: str = "§aMCMotd Bench Server",
+        version: str = "1.21.1",
+        protocol: int = 767,
+        failure: str = "none",
+        failure_rate: float = 1.0
+    ):
+        if failure not in FAILURE_MODES:
+            raise ValueError(f"未知的失败模式: {failure}")
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.failure = failure
+        self.failure_rate = failure_rate
+        self.requests = 0
+
+        status = {
+            "version": {"name": version, "protocol": protocol},
+            "players": {
+                "online": players_online,
+                "max": players_max,
+                "sample": [
+                    {"name": f"Player{i}", "id": str(uuid.UUID(int=i))}
+                    for i in range(player_sample)
+                ]
+            },
+            "description": {"text": motd}
+        }
+        icon = make_icon(icon_size)
+        if icon:
+            status["favicon"] = icon
+        # 状态响应每次都一样,提前编码好
+        self._status_packet = _encode_packet(0x00, _encode_string(json.dumps(status)))
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def address(self) -> str:
+        """供查询使用的地址,格式: host:port"""
+        return f"{self.host}:{self.port}"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "FakeJavaServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                length = await _read_varint(reader)
+                body = await reader.readexactly(length)
+                packet_id = body[0]
+
+                # 握手包: 协议版本、地址、端口、下一状态,内容不影响响应
+                if packet_id == 0x00 and length > 1:
+                    continue
+
+                self.requests += 1
+                if _should_fail(self.failure, self.failure_rate):
+                    if self.failure == "timeout":
+                        # 一直不响应,直到客户端超时断开
+                        await reader.read()
+                    elif self.failure == "garbage":
+                        writer.write(b"\x05\xff\xff\xff\xff\xff")
+                        await writer.drain()
+                    return
+
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+
+                if packet_id == 0x00:
+                    writer.write(self._status_packet)
+                elif packet_id == 0x01:
+                    # Ping: 原样返回 8 字节的载荷
+                    writer.write(_encode_packet(0x01, body[1:9]))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+class _BedrockProtocol(asyncio.DatagramProtocol):
+    def __init__(self, server: "FakeBedrockServer"):
+        self.server = server
+        self.transport: Optional[asyncio.DatagramTransport] = None
+
+    def connection_made(self, transport: asyncio.DatagramTransport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        # 未连接 Ping: 0x01 + 时间戳(8) + MAGIC(16) + 客户端 GUID(8)
+        if len(data) < 25 or data[0] != 0x01 or data[9:25] != RAKNET_MAGIC:
+            return
+        asyncio.ensure_future(self.server._respond(self.transport, data[1:9], addr))
+
+
+class FakeBedrockServer:
+    """模拟 Bedrock 版 RakNet 未连接 Ping 的 UDP 服务器"""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        delay: float = 0.0,
+        players_online: int = 20,
+        players_max: int = 100,
+        motd: str = "MCMotd Bench Server",
+        version: str = "1.21.2",
+        protocol: int = 686,
+        map_name: str = "Bedrock level",
+        gamemode: str = "Survival",
+        failure: str = "none",
+        failure_rate: float = 1.0
+    ):
+        if failure not in FAILURE_MODES:
+            raise ValueError(f"未知的失败模式: {failure}")
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.failure = failure
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self.server_guid = random.getrandbits(63)
+
+        self._fields = [
+            "MCPE", motd, str(protocol), version, str(players_online), str(players_max),
+            str(self.server_guid), map_name, gamemode, "1"
+        ]
+        self._transport: Optional[asyncio.DatagramTransport] = None
+
+    @property
+    def address(self) -> str:
+        """供查询使用的地址,格式: host:port"""
+        return f"{self.host}:{self.port}"
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self._transport, _ = await loop.create_datagram_endpoint(
+            lambda: _BedrockProtocol(self), local_addr=(self.host, self.port)
+        )
+        self.port = self._transport.get_extra_info("sockname")[1]
+        # 广播数据中带有端口,启动后才知道实际端口
+        payload = ";".join(self._fields + [str(self.port), str(self.port)]) + ";"
+        self._payload = payload.encode("utf-8")
+
+    async def stop(self):
+        if self._transport is not None:
+            self._transport.close()
+            self._transport = None
+
+    async def __aenter__(self) -> "FakeBedrockServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def _respond(self, transport: asyncio.DatagramTransport, timestamp: bytes, addr):
+        self.requests += 1
+        if _should_fail(self.failure, self.failure_rate):
+            if self.failure == "garbage":
+                transport.sendto(b"\x1c\x00", addr)
+            return
+
+        if self.delay:
+            await asyncio.sleep(self.delay)
+
+        # 未连接 Pong: 0x1c + 时间戳(8) + 服务器 GUID(8) + MAGIC(16) + 长度(2) + 广播数据
+        packet = (
+            b"\x1c" + timestamp + struct.pack(">q", self.server_guid) + RAKNET_MAGIC
+            + struct.pack(">H", len(self._payload)) + self._payload
+        )
+        if not transport.is_closing():
+            transport.sendto(packet, addr)
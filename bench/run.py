@@ -0,0 +1,186 @@
+"""
+离线基准测试
+在本机启动假服务器(见 fake_servers.py),测量以下查询路径的吞吐量和 p50/p99 延迟:
+- java: utils/motd.py 的 Java 版查询
+- bedrock: utils/motd.py 的 Bedrock 版查询
+- motd: /motd 命令的完整流程(本地查询、客户端查询、格式化消息),不包括发送消息
+
+全程只访问 127.0.0.1,不需要网络,也不需要连接 OneBot 实现端
+默认绕过状态缓存(包括并发查询合并),每次查询都会真实探测假服务器
+加上 --cache 可以测量经过缓存的路径
+
+用法(在项目根目录执行):
+python -m bench.run
+python -m bench.run --requests 2000 --concurrency 64 --icon-size 16384 --player-sample 12
+python -m bench.run --only java --failure close --failure-rate 0.1
+python -m bench.run --only motd --nodes 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+import nonebot
+
+from .fake_servers import FAILURE_MODES, FakeBedrockServer, FakeJavaServer
+
+PLUGIN = "plugins.mcmotd_multicon"
+SCENARIOS = ("java", "bedrock", "motd")
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """最近秩法取百分位数,sorted_values 需已排序"""
+    if not sorted_values:
+        return 0.0
+    index = min(int(len(sorted_values) * fraction), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+async def measure(name: str, call: Callable[[], Awaitable[Dict[str, Any]]], requests: int, concurrency: int) -> Dict[str, Any]:
+    """
+    以给定并发数执行 requests 次 call,统计吞吐量和延迟
+
+    Returns:
+        测试结果,延迟单位为毫秒
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                result = await call()
+                if isinstance(result, dict) and result.get("error"):
+                    errors += 1
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    # 先预热一次,避免首次导入和建立连接的开销计入结果
+    await one()
+    latencies.clear()
+    errors = 0
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "scenario": name,
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": elapsed,
+        "throughput": requests / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000 if latencies else 0.0
+    }
+
+
+def print_results(results: List[Dict[str, Any]]):
+    print(f"{'场景':<10}{'请求数':>8}{'并发':>6}{'失败':>6}{'吞吐(次/秒)':>14}{'p50(ms)':>10}{'p99(ms)':>10}{'max(ms)':>10}")
+    for result in results:
+        print(
+            f"{result['scenario']:<10}{result['requests']:>8}{result['concurrency']:>6}{result['errors']:>6}"
+            f"{result['throughput']:>14.1f}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['max_ms']:>10.2f}"
+        )
+
+
+def init_plugin(args: argparse.Namespace):
+    """以不连接任何实现端的方式初始化 NoneBot 并加载插件"""
+    # 不读取项目中的 .env 文件,避免开启服务器模式或连接实现端
+    os.environ["ENVIRONMENT"] = "bench"
+    nonebot.init(
+        driver="~none",
+        MCMOTD_ENABLE_SERVER=False,
+        MCMOTD_ENABLE_CLIENT=False,
+        MCMOTD_CLIENT_NAME="bench",
+        MCMOTD_SPECIAL_INFO_SHOW=True,
+        MCMOTD_HISTORY_ENABLE=False,
+        MCMOTD_STATUS_CACHE_TTL=args.cache_ttl if args.cache else 0
+    )
+    nonebot.load_plugin(PLUGIN)
+
+
+async def run(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    from importlib import import_module
+
+    motd_utils = import_module(f"{PLUGIN}.utils.motd")
+    format_utils = import_module(f"{PLUGIN}.utils.format")
+    plugin_main = import_module(f"{PLUGIN}.__main__")
+
+    # 状态缓存会把同一地址的并发查询合并成一次,测量探测路径时直接调用未缓存的查询函数
+    if args.cache:
+        query_java, query_bedrock = motd_utils.query_java_server, motd_utils.query_bedrock_server
+    else:
+        query_java, query_bedrock = motd_utils._query_java_server, motd_utils._query_bedrock_server
+
+    java = FakeJavaServer(
+        delay=args.delay, icon_size=args.icon_size, player_sample=args.player_sample,
+        failure=args.failure, failure_rate=args.failure_rate
+    )
+    bedrock = FakeBedrockServer(delay=args.delay, failure=args.failure, failure_rate=args.failure_rate)
+
+    async def motd_pipeline() -> Dict[str, Any]:
+        # 与 handle_motd 相同的调用顺序,远程节点的结果用本地结果模拟
+        local_result, remote_results = await asyncio.gather(
+            query_java(java.address),
+            plugin_main.query_remote_clients("java", java.address)
+        )
+        remote_results = remote_results + [
+            {"name": f"node{i}", "success": True, "data": dict(local_result)}
+            for i in range(args.nodes)
+        ]
+        format_utils.format_java_status_with_config(
+            local_result, remote_results, "bench", java.address, True
+        )
+        return local_result
+
+    calls = {
+        "java": lambda: query_java(java.address),
+        "bedrock": lambda: query_bedrock(bedrock.address),
+        "motd": motd_pipeline
+    }
+
+    results = []
+    async with java, bedrock:
+        for scenario in args.only or SCENARIOS:
+            results.append(await measure(scenario, calls[scenario], args.requests, args.concurrency))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="MCMotd 离线基准测试")
+    parser.add_argument("--requests", type=int, default=500, help="每个场景的请求数")
+    parser.add_argument("--concurrency", type=int, default=32, help="同时进行的请求数")
+    parser.add_argument("--only", choices=SCENARIOS, action="append", help="只运行指定场景,可重复")
+    parser.add_argument("--delay", type=float, default=0.0, help="假服务器响应前的延迟(秒)")
+    parser.add_argument("--icon-size", type=int, default=8192, help="Java 版图标字节数,为 0 时不返回图标")
+    parser.add_argument("--player-sample", type=int, default=12, help="Java 版玩家列表中的玩家数量")
+    parser.add_argument("--failure", choices=FAILURE_MODES, default="none", help="假服务器的失败模式")
+    parser.add_argument("--failure-rate", type=float, default=1.0, help="触发失败模式的比例")
+    parser.add_argument("--nodes", type=int, default=3, help="motd 场景中模拟的远程节点数量")
+    parser.add_argument("--cache", action="store_true", help="开启状态缓存")
+    parser.add_argument("--cache-ttl", type=int, default=10, help="开启状态缓存时的有效期(秒)")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果,便于比较不同版本")
+    args = parser.parse_args()
+
+    init_plugin(args)
+    results = asyncio.run(run(args))
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        print_results(results)
+
+
+if __name__ == "__main__":
+    main()
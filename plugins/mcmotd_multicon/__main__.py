@@ -14,9 +14,14 @@ McMotd_MultiCon 是一个 Nonebot2 插件,在正常提供服务器状态解析
 命令列表:
 --------
 /motd <地址> - 查询指定地址的 Java 服务器状态并输出
+/motd <地址> @<标签> - 只向带有该标签的客户端下发查询,可写多个标签
 /motd <别名> - 查询已保存的别名服务器状态
 /motd - 查询默认服务器状态(需先设置)
 /motdpe <地址> - 查询指定地址的 Bedrock(PE) 服务器状态并输出
+/motdpe <地址> @<标签> - 只向带有该标签的客户端下发查询
+/motdall - 一次性查询本群所有已保存的服务器状态
+/motdstat <地址或别名> [小时] - 查看指定服务器各节点的延迟和在线人数统计(默认最近 24 小时)
+/motdscan [pe] <主机> <起始端口>-<结束端口> - 并发扫描主机的一段端口,列出有响应的服务器(仅超级用户)
 /addmotd <地址> - 添加默认服务器
 /addmotd <别名> <地址> - 添加别名服务器
 /motdlist - 列出本群所有已保存的服务器
@@ -36,28 +41,97 @@ from nonebot.permission import SUPERUSER
 from nonebot.adapters.onebot.v11.permission import GROUP_ADMIN, GROUP_OWNER
 
 import asyncio
+import time
+from typing import Optional
 
 from .config import Config
 from .utils.motd import query_java_server, query_bedrock_server
-from .utils.format import format_java_status_with_config, format_bedrock_status_with_config
+from .utils.format import format_java_status_with_config, format_bedrock_status_with_config, format_java_board, format_scan_result
+from .utils.scan import parse_port_range, scan_ports
+from .utils.admission import check_rate_limit, get_admission_queue
+from .func.admission import QueueFullError
+from .utils.card import format_java_status_card, format_bedrock_status_card
 from .func.quickquery import get_quick_query_manager
-from .ws.fastapi_wserver import start_server, get_connected_clients
-from .ws.wsclient import start_client, get_client_status
+from .func.poller import get_status_poller
+from .func.history import get_history_store
+from .ws.fastapi_wserver import start_server, get_connected_clients, get_client_tags
+from .ws.wsclient import start_client, get_hub_states
+from .ws.protocol import PROFILE_LATENCY, PROFILE_MOTD
 
 config = get_plugin_config(Config)
 
 # 命令处理器
 motd = on_command("motd", priority=5, block=True)
 motdpe = on_command("motdpe", priority=5, block=True)
+motdall = on_command("motdall", priority=5, block=True)
+motdstat = on_command("motdstat", priority=5, block=True)
+motdscan = on_command("motdscan", priority=5, block=True, permission=SUPERUSER)
 mcmotd = on_command("mcmotd", priority=5, block=True)
 addmotd = on_command("addmotd", priority=5, block=True, permission=GROUP_ADMIN | GROUP_OWNER | SUPERUSER)
 delmotd = on_command("delmotd", priority=5, block=True, permission=GROUP_ADMIN | GROUP_OWNER | SUPERUSER)
 motdlist = on_command("motdlist", priority=5, block=True)
 
+def split_tags(text: str) -> tuple:
+    """
+    拆分命令参数中的地址和 @标签
+
+    Returns:
+        (地址, 标签列表)
+    """
+    words = text.split()
+    tags = [word[1:] for word in words if word.startswith("@") and len(word) > 1]
+    address = " ".join(word for word in words if not word.startswith("@"))
+    return address, tags
+
+def remote_profile() -> str:
+    """客户端结果只用于显示延迟,开启特殊信息显示时还需要比较 MOTD 和图标"""
+    return PROFILE_MOTD if config.MCMOTD_SPECIAL_INFO_SHOW else PROFILE_LATENCY
+
+def queue_notice() -> Optional[str]:
+    """查询需要排队时返回排队提示,不需要排队或排队已满(将被直接拒绝)时返回 None"""
+    queue = get_admission_queue()
+    if queue.would_queue():
+        return f"当前查询较多,排队中(前面还有 {queue.queued} 个)..."
+    return None
+
+async def query_remote_clients(query_type: str, address: str, tags: list = None) -> list:
+    """服务器模式下向所有客户端(指定标签时只向匹配的客户端)下发查询请求,未启用时返回空列表"""
+    if not config.MCMOTD_ENABLE_SERVER:
+        return []
+    
+    from .ws.fastapi_wserver import get_server_instance
+    srv = get_server_instance()
+    if not srv:
+        logger.warning("服务器实例未初始化")
+        return []
+    
+    logger.info(f"开始向客户端下发查询请求: {address}")
+    remote_results = await srv.query_all_clients(
+        query_type, address, config.MCMOTD_SERVER_STATUS_TIMEOUT, tags, remote_profile()
+    )
+    logger.info(f"收到 {len(remote_results)} 个客户端响应")
+    return remote_results
+
+async def query_remote_clients_batch(query_type: str, addresses: list) -> list:
+    """服务器模式下在一条消息中向所有客户端下发多个地址,返回与地址一一对应的结果列表"""
+    if not config.MCMOTD_ENABLE_SERVER:
+        return [[] for _ in addresses]
+    
+    from .ws.fastapi_wserver import get_server_instance
+    srv = get_server_instance()
+    if not srv:
+        logger.warning("服务器实例未初始化")
+        return [[] for _ in addresses]
+    
+    logger.info(f"开始向客户端下发批量查询请求: {len(addresses)} 个地址")
+    return await srv.query_all_clients_batch(
+        query_type, addresses, config.MCMOTD_SERVER_STATUS_TIMEOUT, PROFILE_LATENCY
+    )
+
 @motd.handle()
 async def handle_motd(bot: Bot, event: MessageEvent, args: Message = CommandArg()):
     """处理 Java 版服务器状态查询命令"""
-    address = args.extract_plain_text().strip()
+    address, tags = split_tags(args.extract_plain_text())
     
     # 快速查询功能
     qm = get_quick_query_manager()
@@ -76,92 +150,292 @@ async def handle_motd(bot: Bot, event: MessageEvent, args: Message = CommandArg(
         if alias_address:
             address = alias_address
     
-    # 发送查询提示并获取消息ID
-    searching_msg = await motd.send("正在查询服务器状态...")
-    searching_msg_id = searching_msg["message_id"]
+    # 按群和用户限流
+    limited = check_rate_limit(event)
+    if limited:
+        await motd.finish(limited)
     
+    searching_msg_id = None
     try:
-        # 查询本地服务器
-        local_result = await query_java_server(address)
+        # 本地查询与客户端查询互不依赖,同时进行,整体在查询队列中排队
+        # 需要排队时先回复排队提示,排队已满的命令直接拒绝,不发送任何提示
+        notice = queue_notice()
+        if notice:
+            searching_msg_id = (await motd.send(notice))["message_id"]
+        async with get_admission_queue().admit():
+            # 进入队列后再发送查询提示,被拒绝的命令不会多出发送和撤回两次调用
+            if searching_msg_id is None:
+                searching_msg = await motd.send("正在查询服务器状态...")
+                searching_msg_id = searching_msg["message_id"]
+            local_result, remote_results = await asyncio.gather(
+                query_java_server(address),
+                query_remote_clients("java", address, tags)
+            )
         
-        # 如果是服务器模式,查询所有客户端
-        remote_results = []
-        if config.MCMOTD_ENABLE_SERVER:
-            from .ws.fastapi_wserver import get_server_instance
-            srv = get_server_instance()
-            if srv:
-                logger.info(f"开始向客户端下发查询请求: {address}")
-                remote_results = await srv.query_all_clients(
-                    "java", address, config.MCMOTD_SERVER_STATUS_TIMEOUT
-                )
-                logger.info(f"收到 {len(remote_results)} 个客户端响应")
-            else:
-                logger.warning("服务器实例未初始化")
+        # 记录查询历史
+        if config.MCMOTD_HISTORY_ENABLE:
+            get_history_store().record_query(address, config.MCMOTD_CLIENT_NAME or "本地", local_result, remote_results)
         
         # 撤回查询提示消息
         await bot.delete_msg(message_id=searching_msg_id)
         
         # 格式化并发送结果
-        message = format_java_status_with_config(local_result, remote_results, config.MCMOTD_CLIENT_NAME or "本地", address, config.MCMOTD_SPECIAL_INFO_SHOW)
+        if config.MCMOTD_CARD_ENABLE:
+            message = await format_java_status_card(local_result, remote_results, config.MCMOTD_CLIENT_NAME or "本地", address, config.MCMOTD_SPECIAL_INFO_SHOW)
+        else:
+            message = format_java_status_with_config(local_result, remote_results, config.MCMOTD_CLIENT_NAME or "本地", address, config.MCMOTD_SPECIAL_INFO_SHOW)
         await motd.finish(message)
         
     except FinishedException:
         raise
+    except QueueFullError as e:
+        # 排队已满,快速拒绝;只有发送排队提示后队列恰好被占满时才需要撤回
+        if searching_msg_id is not None:
+            try:
+                await bot.delete_msg(message_id=searching_msg_id)
+            except:
+                pass
+        await motd.finish(str(e))
     except Exception as e:
         # 出错时也尝试撤回提示消息
-        try:
-            await bot.delete_msg(message_id=searching_msg_id)
-        except:
-            pass
+        if searching_msg_id is not None:
+            try:
+                await bot.delete_msg(message_id=searching_msg_id)
+            except:
+                pass
         logger.error(f"查询服务器失败: {e}")
         await motd.finish(f"查询失败: {str(e)}")
 
 @motdpe.handle()
 async def handle_motdpe(bot: Bot, event: MessageEvent, args: Message = CommandArg()):
     """处理 Bedrock 版服务器状态查询命令"""
-    address = args.extract_plain_text().strip()
+    address, tags = split_tags(args.extract_plain_text())
     if not address:
         await motdpe.finish("请输入服务器地址,例如: /motdpe play.cubecraft.net")
     
-    # 发送查询提示并获取消息ID
-    searching_msg = await motdpe.send("正在查询服务器状态...")
-    searching_msg_id = searching_msg["message_id"]
+    # 按群和用户限流
+    limited = check_rate_limit(event)
+    if limited:
+        await motdpe.finish(limited)
     
+    searching_msg_id = None
     try:
-        # 查询本地服务器
-        local_result = await query_bedrock_server(address)
-        
-        # 如果是服务器模式,查询所有客户端
-        remote_results = []
-        if config.MCMOTD_ENABLE_SERVER:
-            from .ws.fastapi_wserver import get_server_instance
-            srv = get_server_instance()
-            if srv:
-                logger.info(f"开始向客户端下发查询请求: {address}")
-                remote_results = await srv.query_all_clients(
-                    "bedrock", address, config.MCMOTD_SERVER_STATUS_TIMEOUT
-                )
-                logger.info(f"收到 {len(remote_results)} 个客户端响应")
-            else:
-                logger.warning("服务器实例未初始化")
+        # 本地查询与客户端查询互不依赖,同时进行,整体在查询队列中排队
+        # 需要排队时先回复排队提示,排队已满的命令直接拒绝,不发送任何提示
+        notice = queue_notice()
+        if notice:
+            searching_msg_id = (await motdpe.send(notice))["message_id"]
+        async with get_admission_queue().admit():
+            # 进入队列后再发送查询提示,被拒绝的命令不会多出发送和撤回两次调用
+            if searching_msg_id is None:
+                searching_msg = await motdpe.send("正在查询服务器状态...")
+                searching_msg_id = searching_msg["message_id"]
+            local_result, remote_results = await asyncio.gather(
+                query_bedrock_server(address),
+                query_remote_clients("bedrock", address, tags)
+            )
         
         # 撤回查询提示消息
         await bot.delete_msg(message_id=searching_msg_id)
         
         # 格式化并发送结果
-        message = format_bedrock_status_with_config(local_result, remote_results, config.MCMOTD_CLIENT_NAME or "本地", address, config.MCMOTD_SPECIAL_INFO_SHOW)
+        if config.MCMOTD_CARD_ENABLE:
+            message = await format_bedrock_status_card(local_result, remote_results, config.MCMOTD_CLIENT_NAME or "本地", address, config.MCMOTD_SPECIAL_INFO_SHOW)
+        else:
+            message = format_bedrock_status_with_config(local_result, remote_results, config.MCMOTD_CLIENT_NAME or "本地", address, config.MCMOTD_SPECIAL_INFO_SHOW)
         await motdpe.finish(message)
         
     except FinishedException:
         raise
+    except QueueFullError as e:
+        # 排队已满,快速拒绝;只有发送排队提示后队列恰好被占满时才需要撤回
+        if searching_msg_id is not None:
+            try:
+                await bot.delete_msg(message_id=searching_msg_id)
+            except:
+                pass
+        await motdpe.finish(str(e))
     except Exception as e:
         # 出错时也尝试撤回提示消息
+        if searching_msg_id is not None:
+            try:
+                await bot.delete_msg(message_id=searching_msg_id)
+            except:
+                pass
+        logger.error(f"查询服务器失败: {e}")
+        await motdpe.finish(f"查询失败: {str(e)}")
+
+@motdall.handle()
+async def handle_motdall(bot: Bot, event: MessageEvent):
+    """处理批量查询本群所有已保存服务器的命令"""
+    group_id = str(event.group_id) if hasattr(event, 'group_id') else str(event.user_id)
+    qm = get_quick_query_manager()
+    
+    servers = qm.list_servers(group_id)
+    if not servers:
+        await motdall.finish("本群还没有添加任何服务器\n使用 /addmotd 添加服务器")
+    
+    # 默认服务器排在最前
+    aliases = sorted(servers, key=lambda alias: alias != "default")
+    addresses = [servers[alias] for alias in aliases]
+    
+    # 按群和用户限流
+    limited = check_rate_limit(event)
+    if limited:
+        await motdall.finish(limited)
+    
+    searching_msg_id = None
+    try:
+        # 所有服务器的本地查询与一次批量客户端查询同时进行,整体在查询队列中排队
+        # 需要排队时先回复排队提示,排队已满的命令直接拒绝,不发送任何提示
+        notice = queue_notice()
+        if notice:
+            searching_msg_id = (await motdall.send(notice))["message_id"]
+        async with get_admission_queue().admit():
+            # 进入队列后再发送查询提示,被拒绝的命令不会多出发送和撤回两次调用
+            if searching_msg_id is None:
+                searching_msg = await motdall.send(f"正在查询 {len(addresses)} 个服务器状态...")
+                searching_msg_id = searching_msg["message_id"]
+            local_results, remote_batches = await asyncio.gather(
+                asyncio.gather(*(query_java_server(address) for address in addresses)),
+                query_remote_clients_batch("java", addresses)
+            )
+        
+        # 记录查询历史
+        if config.MCMOTD_HISTORY_ENABLE:
+            history = get_history_store()
+            for address, local_result, remote_results in zip(addresses, local_results, remote_batches):
+                history.record_query(address, config.MCMOTD_CLIENT_NAME or "本地", local_result, remote_results)
+        
+        # 撤回查询提示消息
+        await bot.delete_msg(message_id=searching_msg_id)
+        
+        message = format_java_board(aliases, addresses, local_results, remote_batches, config.MCMOTD_CLIENT_NAME or "本地")
+        await motdall.finish(message)
+        
+    except FinishedException:
+        raise
+    except QueueFullError as e:
+        # 排队已满,快速拒绝;只有发送排队提示后队列恰好被占满时才需要撤回
+        if searching_msg_id is not None:
+            try:
+                await bot.delete_msg(message_id=searching_msg_id)
+            except:
+                pass
+        await motdall.finish(str(e))
+    except Exception as e:
+        # 出错时也尝试撤回提示消息
+        if searching_msg_id is not None:
+            try:
+                await bot.delete_msg(message_id=searching_msg_id)
+            except:
+                pass
+        logger.error(f"批量查询服务器失败: {e}")
+        await motdall.finish(f"查询失败: {str(e)}")
+
+def _format_stat_value(value, suffix: str = "") -> str:
+    return f"{value:.2f}{suffix}" if value is not None else "-"
+
+@motdstat.handle()
+async def handle_motdstat(bot: Bot, event: MessageEvent, args: Message = CommandArg()):
+    """处理查询历史统计命令"""
+    if not config.MCMOTD_HISTORY_ENABLE:
+        await motdstat.finish("查询历史记录未启用")
+    
+    params = args.extract_plain_text().strip().split()
+    if not params:
+        await motdstat.finish("用法: /motdstat 地址或别名 [小时]\n例如: /motdstat mc.hypixel.net 24")
+    
+    address = params[0]
+    try:
+        hours = float(params[1]) if len(params) > 1 else 24.0
+    except ValueError:
+        await motdstat.finish("时间窗口必须是数字(小时)")
+    if hours <= 0:
+        await motdstat.finish("时间窗口必须大于 0")
+    
+    # 先尝试作为别名查询
+    group_id = str(event.group_id) if hasattr(event, 'group_id') else str(event.user_id)
+    address = get_quick_query_manager().get_server(group_id, address) or address
+    
+    stats = await get_history_store().query_stats(address, hours * 3600)
+    if not stats:
+        await motdstat.finish(f"最近 {hours:g} 小时内没有 {address} 的查询记录")
+    
+    lines = [f"{address} 最近 {hours:g} 小时统计:"]
+    for node, node_stats in stats.items():
+        lines.append("========================")
+        lines.append(f"{node}: 样本 {node_stats['samples']}, 成功率 {node_stats['success_rate'] * 100:.1f}%")
+        lines.append(
+            f"延迟 最低/中位/p95: {_format_stat_value(node_stats['latency_min'])}"
+            f"/{_format_stat_value(node_stats['latency_median'])}"
+            f"/{_format_stat_value(node_stats['latency_p95'])} ms"
+        )
+        if node_stats["players_max"] is not None:
+            lines.append(
+                f"在线人数 平均 {node_stats['players_avg']:.1f}, 最高 {node_stats['players_max']}, "
+                f"趋势 {node_stats['players_first']} -> {node_stats['players_last']}"
+            )
+    if len(stats) > 1:
+        lines.append("========================")
+        lines.append("注: 在线人数趋势只由本地节点记录,子节点只返回延迟")
+    
+    await motdstat.finish("\n".join(lines))
+
+@motdscan.handle()
+async def handle_motdscan(bot: Bot, event: MessageEvent, args: Message = CommandArg()):
+    """处理端口扫描命令"""
+    params = args.extract_plain_text().strip().split()
+    edition = "java"
+    if params and params[0].lower() == "pe":
+        edition = "bedrock"
+        params = params[1:]
+    if len(params) != 2:
+        await motdscan.finish("用法: /motdscan [pe] 主机 起始端口-结束端口\n例如: /motdscan mc.example.com 25565-25600")
+    
+    host = params[0]
+    try:
+        start, end = parse_port_range(params[1])
+    except ValueError as e:
+        await motdscan.finish(str(e))
+    
+    searching_msg = await motdscan.send(f"正在扫描 {host} 的 {end - start + 1} 个端口...")
+    searching_msg_id = searching_msg["message_id"]
+    
+    try:
+        scan = await scan_ports(edition, host, start, end)
+        await bot.delete_msg(message_id=searching_msg_id)
+        await motdscan.finish(format_scan_result(scan))
+    except FinishedException:
+        raise
+    except Exception as e:
         try:
             await bot.delete_msg(message_id=searching_msg_id)
         except:
             pass
-        logger.error(f"查询服务器失败: {e}")
-        await motdpe.finish(f"查询失败: {str(e)}")
+        logger.error(f"端口扫描失败: {e}")
+        await motdscan.finish(f"扫描失败: {str(e)}")
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}秒"
+    if seconds < 3600:
+        return f"{seconds // 60}分{seconds % 60}秒"
+    return f"{seconds // 3600}小时{seconds % 3600 // 60}分"
+
+def _format_hub_state(state) -> str:
+    """格式化一个主干服务器的连接状态"""
+    parts = [state.status]
+    if state.connected:
+        since = time.strftime("%m-%d %H:%M:%S", time.localtime(state.connected_since))
+        parts.append(f"连接于 {since}, 已持续 {_format_duration(time.time() - state.connected_since)}")
+        if state.last_rtt is not None:
+            parts.append(f"心跳延迟 {state.last_rtt:.1f} ms")
+    elif state.retry_at is not None:
+        parts.append(f"{_format_duration(max(state.retry_at - time.time(), 0))}后重连")
+    parts.append(f"重连 {state.reconnects} 次")
+    return f"- {state.server_url}: " + ", ".join(parts)
 
 @mcmotd.handle()
 async def handle_mcmotd(bot: Bot, event: MessageEvent, args: Message = CommandArg()):
@@ -177,7 +451,11 @@ async def handle_mcmotd(bot: Bot, event: MessageEvent, args: Message = CommandAr
         if not clients:
             await mcmotd.finish("当前没有客户端连接")
         
-        msg = "已连接的客户端:\n" + "\n".join(f"- {name}" for name in clients)
+        lines = []
+        for name in clients:
+            tags = get_client_tags(name)
+            lines.append(f"- {name}" + (f" [{', '.join(tags)}]" if tags else ""))
+        msg = "已连接的客户端:\n" + "\n".join(lines)
         await mcmotd.finish(msg)
         
     elif command == "server status":
@@ -198,13 +476,20 @@ async def handle_mcmotd(bot: Bot, event: MessageEvent, args: Message = CommandAr
             status_lines.append("服务器模式: 未启用")
         
         if config.MCMOTD_ENABLE_CLIENT:
-            client_status = get_client_status()
             status_lines.append(f"\n客户端模式: 已启用")
             status_lines.append(f"客户端名称: {config.MCMOTD_CLIENT_NAME}")
-            status_lines.append(f"连接状态: {client_status}")
+            status_lines.append("主干服务器连接:")
+            status_lines.extend(_format_hub_state(state) for state in get_hub_states())
         else:
             status_lines.append("\n客户端模式: 未启用")
         
+        # 查询队列
+        queue = get_admission_queue()
+        status_lines.append(
+            f"\n查询队列: 执行中 {queue.active}/{queue.concurrency}, "
+            f"排队 {queue.queued}/{queue.max_queued}, 已拒绝 {queue.rejected}"
+        )
+        
         await mcmotd.finish("\n".join(status_lines))
     else:
         await mcmotd.finish("可用命令:\n/mcmotd client list - 查看客户端列表\n/mcmotd server status - 查看服务器状态")
@@ -222,12 +507,12 @@ async def handle_addmotd(bot: Bot, event: MessageEvent, args: Message = CommandA
     
     if len(params) == 1:
         # 只有一个参数,作为默认服务器
-        result = qm.add_server(group_id, "default", params[0])
+        result = await qm.add_server(group_id, "default", params[0])
         await addmotd.finish(result)
     elif len(params) == 2:
         # 两个参数,别名和地址
         alias, address = params
-        result = qm.add_server(group_id, alias, address)
+        result = await qm.add_server(group_id, alias, address)
         await addmotd.finish(result)
 
 @motdlist.handle()
@@ -266,7 +551,7 @@ async def handle_delmotd(bot: Bot, event: MessageEvent, args: Message = CommandA
     group_id = str(event.group_id) if hasattr(event, 'group_id') else str(event.user_id)
     qm = get_quick_query_manager()
     
-    result = qm.delete_server(group_id, alias)
+    result = await qm.delete_server(group_id, alias)
     await delmotd.finish(result)
 
 # 插件启动时初始化
@@ -277,6 +562,9 @@ async def startup():
     """插件启动时的初始化"""
     logger.info("MCMotd_MultiCon 插件启动中...")
     
+    # 提前加载快速查询数据,首次启动时会导入旧版 JSON 文件
+    get_quick_query_manager()
+    
     # 启动服务器模式
     if config.MCMOTD_ENABLE_SERVER:
         asyncio.create_task(start_server(config))
@@ -286,8 +574,42 @@ async def startup():
     if config.MCMOTD_ENABLE_CLIENT:
         asyncio.create_task(start_client(config))
         logger.info(f"客户端模式已启动,连接到: {config.MCMOTD_CONNECT_SERVERS}")
+    
+    # 启动后台状态轮询
+    if config.MCMOTD_POLL_GROUPS:
+        get_status_poller().start()
+    
+    # 启动查询历史定期写入
+    if config.MCMOTD_HISTORY_ENABLE:
+        get_history_store().start(config.MCMOTD_HISTORY_FLUSH_INTERVAL)
 
 @driver.on_shutdown
 async def shutdown():
     """插件关闭时的清理"""
-    logger.info("MCMotd_MultiCon 插件关闭中...")
\ No newline at end of file
+    logger.info("MCMotd_MultiCon 插件关闭中...")
+    
+    # 停止后台状态轮询
+    if config.MCMOTD_POLL_GROUPS:
+        get_status_poller().stop()
+    
+    # 写入剩余的查询历史
+    if config.MCMOTD_HISTORY_ENABLE:
+        await get_history_store().stop()
+    
+    # 关闭 C++ 探测线程池
+    if config.MCMOTD_EXPERIMENTAL_LATENCY_CHECK:
+        try:
+            from .func.networktools_cpp import entrypoint
+            entrypoint.shutdown()
+        except Exception as e:
+            logger.error(f"关闭探测线程池失败: {e}")
+    
+    # 关闭 Query 协议的 UDP 端点
+    if config.MCMOTD_JAVA_QUERY:
+        from .func import query
+        query.shutdown()
+    
+    # 关闭卡片渲染线程池
+    if config.MCMOTD_CARD_ENABLE:
+        from .utils import card
+        card.shutdown()
\ No newline at end of file
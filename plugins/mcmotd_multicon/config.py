@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List
+from typing import Dict, List
 
 
 class Config(BaseModel):
@@ -11,15 +11,73 @@ class Config(BaseModel):
     MCMOTD_SERVER_Port: int = Field(default=60000, ge=1, le=65535)  # 服务器端口
     MCMOTD_SERVER_ALLOW_NAMES: List[str] = Field(default_factory=list)  # 允许连接的客户端名称列表
     MCMOTD_SERVER_STATUS_TIMEOUT: int = Field(default=10, ge=1, le=60)  # 状态查询超时时间(秒)
+    MCMOTD_SERVER_ADAPTIVE_TIMEOUT: bool = False  # 按各客户端查询同一服务器的历史响应时间计算各自的超时时间,上限为 MCMOTD_SERVER_STATUS_TIMEOUT
+    MCMOTD_SERVER_TIMEOUT_MIN: float = Field(default=2.0, gt=0)  # 自适应超时时间的下限(秒)
+    MCMOTD_SERVER_QUORUM: int = Field(default=0, ge=0)  # 收到多少个客户端响应后即返回结果,其余标记为等待中,0 为等待所有客户端
+    MCMOTD_SERVER_METRICS: bool = False  # 是否在 FastAPI 服务器上开放 /metrics 指标端点
     
     # 客户端模式配置
     MCMOTD_ENABLE_CLIENT: bool = False  # 是否启用客户端模式
     MCMOTD_CONNECT_SERVERS: List[str] = Field(default_factory=list)  # 要连接的服务器地址列表
     MCMOTD_CLIENT_NAME: str = ""  # 客户端名称
+    MCMOTD_CLIENT_TAGS: List[str] = Field(default_factory=list)  # 客户端标签,如地区、运营商、是否支持 IPv6
+    MCMOTD_CLIENT_RECONNECT_MIN: float = Field(default=5.0, gt=0)  # 断线重连的初始等待时间(秒),连续失败时指数增长
+    MCMOTD_CLIENT_RECONNECT_MAX: float = Field(default=300.0, gt=0)  # 断线重连的最长等待时间(秒)
+    MCMOTD_CLIENT_MAX_CONCURRENCY: int = Field(default=8, ge=1)  # 客户端同时探测的服务器数量上限,批量查询的每个地址各算一个
+    MCMOTD_RELAY_ENABLE: bool = False  # 同时启用服务器和客户端模式时作为中继节点,把上游的查询转发给下游客户端并汇总返回
     
     # 通用配置
     MCMOTD_SERVER_TOKEN: str = ""  # WebSocket 连接令牌
+    MCMOTD_WS_COMPRESS_THRESHOLD: int = Field(default=1024, ge=0)  # 节点间消息超过此字节数时压缩
     MCMOTD_SPECIAL_INFO_SHOW: bool = False  # 是否显示不同节点的特殊信息
-    MCMOTD_QUICKQUERY_DATA_PATH: str = "data/quickquery.json"  # 快速查询数据存储路径
+    MCMOTD_QUICKQUERY_DB_PATH: str = "data/quickquery.db"  # 快速查询数据库路径
+    MCMOTD_QUICKQUERY_DATA_PATH: str = "data/quickquery.json"  # 旧版快速查询 JSON 文件路径,首次启动时导入数据库
     MCMOTD_EXPERIMENTAL_LATENCY_CHECK: bool = False  # 启用实验性延迟检测功能
-    MCMOTD_SHOW_EXPERIMENTAL_MARK: bool = False  # 显示实验性功能标记
\ No newline at end of file
+    MCMOTD_PROBE_WORKERS: int = Field(default=8, ge=1)  # 实验性延迟检测等 C++ 探测的最大并行数
+    MCMOTD_SHOW_EXPERIMENTAL_MARK: bool = False  # 显示实验性功能标记
+    MCMOTD_LATENCY_SAMPLES: int = Field(default=1, ge=1, le=20)  # 每次查询的延迟采样次数,大于 1 时显示最低/平均/p95/抖动/丢包
+    MCMOTD_LATENCY_SAMPLE_INTERVAL: float = Field(default=0.05, ge=0)  # 相邻延迟采样的发出间隔(秒)
+    MCMOTD_JAVA_QUERY: bool = False  # 查询 Java 服务器时同时尝试 Query 协议(enable-query),获取完整玩家列表、地图和插件
+    MCMOTD_JAVA_QUERY_PORT: int = Field(default=0, ge=0, le=65535)  # Query 端口,0 为与游戏端口相同
+    MCMOTD_JAVA_QUERY_TIMEOUT: float = Field(default=2.0, gt=0)  # Query 协议每次收发的超时时间(秒)
+    MCMOTD_STATUS_CACHE_TTL: int = Field(default=10, ge=0)  # 状态缓存有效期(秒),0 为不缓存
+    MCMOTD_STATUS_CACHE_SIZE: int = Field(default=256, ge=1)  # 状态缓存最大条目数
+    MCMOTD_DNS_NEGATIVE_TTL: int = Field(default=60, ge=0)  # 未找到记录时的否定缓存时间(秒)
+    MCMOTD_DNS_CACHE_SIZE: int = Field(default=1024, ge=1)  # DNS 缓存最大条目数
+    MCMOTD_ICON_STORE_SIZE: int = Field(default=128, ge=1)  # 按哈希保存的节点图标最大数量
+    MCMOTD_ICON_SEND_FILE: bool = False  # 以本地文件路径发送图标,仅在 OneBot 实现与机器人运行在同一台机器上时可用
+    MCMOTD_ICON_CACHE_DIR: str = "data/icons"  # 以文件发送时图标的缓存目录
+    MCMOTD_ICON_CACHE_SIZE: int = Field(default=256, ge=1)  # 图标缓存目录中保存的最大文件数
+    
+    # 状态卡片配置
+    MCMOTD_CARD_ENABLE: bool = False  # 是否以图片卡片发送 /motd 和 /motdpe 的结果,需要安装 Pillow
+    MCMOTD_CARD_FONT_PATH: str = ""  # 卡片使用的字体文件路径,为空时尝试常见的中文字体
+    MCMOTD_CARD_WORKERS: int = Field(default=2, ge=1)  # 渲染卡片的线程数
+    
+    # 查询限流配置
+    MCMOTD_GROUP_RATE_LIMIT: float = Field(default=0, ge=0)  # 每个群每分钟允许的查询命令次数,0 为不限制
+    MCMOTD_GROUP_RATE_BURST: int = Field(default=5, ge=1)  # 每个群允许连续发起的查询命令次数
+    MCMOTD_USER_RATE_LIMIT: float = Field(default=0, ge=0)  # 每个用户每分钟允许的查询命令次数,0 为不限制
+    MCMOTD_USER_RATE_BURST: int = Field(default=3, ge=1)  # 每个用户允许连续发起的查询命令次数
+    MCMOTD_QUERY_CONCURRENCY: int = Field(default=16, ge=1)  # 同时执行的查询命令数量上限
+    MCMOTD_QUERY_QUEUE_SIZE: int = Field(default=32, ge=0)  # 排队等待执行的查询命令数量上限,超出时直接拒绝
+    
+    # 端口扫描配置
+    MCMOTD_SCAN_MAX_PORTS: int = Field(default=256, ge=1, le=65535)  # /motdscan 一次最多扫描的端口数
+    MCMOTD_SCAN_RATE: float = Field(default=200.0, gt=0)  # 每秒最多发出的探测数,所有扫描共用
+    MCMOTD_SCAN_CONCURRENCY: int = Field(default=64, ge=1)  # Java 版扫描同时打开的连接数上限
+    MCMOTD_SCAN_TIMEOUT: float = Field(default=3.0, gt=0)  # 单个端口的探测超时时间(秒)
+    
+    # 后台轮询配置
+    MCMOTD_POLL_GROUPS: Dict[str, int] = Field(default_factory=dict)  # 开启后台轮询的群号及轮询间隔(秒)
+    MCMOTD_POLL_JITTER: float = Field(default=0.1, ge=0, lt=1)  # 轮询间隔随机抖动比例
+    MCMOTD_POLL_PLAYER_DELTA: int = Field(default=10, ge=1)  # 在线人数与上一次通知时相比变化达到此值时推送通知
+    MCMOTD_POLL_OFFLINE_AFTER: int = Field(default=2, ge=1)  # 连续查询失败达到此次数才推送离线通知
+    MCMOTD_POLL_SNAPSHOT_TTL: int = Field(default=60, ge=0)  # 轮询结果在状态缓存中的有效期(秒)
+    
+    # 查询历史配置
+    MCMOTD_HISTORY_ENABLE: bool = False  # 是否记录查询历史,用于 /motdstat 统计
+    MCMOTD_HISTORY_DB_PATH: str = "data/history.db"  # 查询历史数据库路径
+    MCMOTD_HISTORY_RING_SIZE: int = Field(default=1024, ge=16)  # 每个地址和节点在内存中缓冲的采样数
+    MCMOTD_HISTORY_FLUSH_INTERVAL: int = Field(default=60, ge=1)  # 缓冲采样写入数据库的间隔(秒)
+    MCMOTD_HISTORY_RETENTION_DAYS: int = Field(default=30, ge=1)  # 查询历史保留天数
\ No newline at end of file
@@ -0,0 +1,104 @@
+"""
+查询准入控制模块
+每条查询命令都会触发一次本地探测和一次向所有客户端的分发,需要在入口处限制流量:
+- KeyedRateLimiter: 按群和按用户各自的令牌桶,超出速率的命令直接拒绝
+- AdmissionQueue: 全局的有界队列,同时执行的查询数量有上限,排队已满时立即拒绝而不是无限堆积
+
+突发流量只会让发起突发的群被限流或让新命令被快速拒绝,已经在执行的查询不受影响
+"""
+
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Hashable, Optional
+
+from .ratelimit import TokenBucket
+from . import metrics
+
+
+class QueueFullError(Exception):
+    """排队的查询已达上限"""
+
+
+class KeyedRateLimiter:
+    """按键(群号、用户号)分别限速,最多保留 max_keys 个令牌桶,淘汰最久未使用的"""
+
+    def __init__(self, rate_per_minute: float, burst: int, max_keys: int = 4096):
+        """
+        Args:
+            rate_per_minute: 每分钟允许的次数,为 0 时不限速
+            burst: 允许连续执行的次数
+            max_keys: 最多保留的令牌桶数量
+        """
+        self.rate = rate_per_minute / 60
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()
+
+    def _bucket(self, key: Hashable) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.burst)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        self._buckets.move_to_end(key)
+        return bucket
+
+    def peek(self, key: Hashable) -> Optional[float]:
+        """检查是否有令牌但不取出,有令牌时返回 None,被限流时返回需要等待的秒数"""
+        if self.rate <= 0:
+            return None
+        retry_after = self._bucket(key).retry_after()
+        return retry_after if retry_after > 0 else None
+
+    def take(self, key: Hashable):
+        """取出一个令牌,调用前应先用 peek 确认令牌足够"""
+        if self.rate > 0:
+            self._bucket(key).try_acquire()
+
+
+class AdmissionQueue:
+    """同时执行数量有上限、排队数量有上限的准入队列"""
+
+    def __init__(self, concurrency: int, max_queued: int):
+        """
+        Args:
+            concurrency: 同时执行的查询数量上限
+            max_queued: 排队等待的查询数量上限,超出时立即拒绝
+        """
+        self.concurrency = concurrency
+        self.max_queued = max_queued
+        self.active = 0
+        self.queued = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def would_queue(self) -> bool:
+        """现在进入队列是否需要排队等待(排队已满、会被拒绝时为 False)"""
+        return self._semaphore.locked() and self.queued < self.max_queued
+
+    @asynccontextmanager
+    async def admit(self):
+        """
+        进入队列并等待执行
+
+        Raises:
+            QueueFullError: 没有空闲名额且排队已满
+        """
+        if self._semaphore.locked() and self.queued >= self.max_queued:
+            self.rejected += 1
+            metrics.queries_rejected.inc(reason="queue_full")
+            raise QueueFullError(f"当前查询繁忙(执行中 {self.active},排队 {self.queued}),请稍后再试")
+
+        self.queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
@@ -0,0 +1,105 @@
+"""
+状态缓存模块
+为服务器状态查询提供带 TTL 和 LRU 容量上限的进程内缓存
+同一时间对同一目标的重复查询会合并到同一个正在进行的查询上,只探测一次
+主干节点和客户端节点都经过 utils/motd.py 调用,所以两边都能受益
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from . import metrics
+
+
+def normalize_address(address: str | int) -> str:
+    """规范化服务器地址作为缓存键,大小写和首尾空白不影响命中"""
+    return str(address).strip().lower().rstrip(".")
+
+
+class StatusCache:
+    """服务器状态缓存"""
+
+    def __init__(self, ttl: float, max_size: int):
+        """
+        初始化状态缓存
+
+        Args:
+            ttl: 缓存有效期(秒),为 0 时不缓存结果,只合并并发查询
+            max_size: 最多缓存的条目数,超出时淘汰最久未使用的条目
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    def get(self, key: Hashable) -> Optional[Dict[str, Any]]:
+        """获取未过期的缓存结果,不存在或已过期时返回 None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Dict[str, Any], ttl: Optional[float] = None):
+        """写入缓存结果,ttl 为 None 时使用默认有效期"""
+        ttl = self.ttl if ttl is None else ttl
+        if ttl <= 0:
+            return
+
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        获取缓存结果,未命中时调用 fetch 查询
+
+        同一个键同时只会有一个 fetch 在执行,其余调用等待它的结果
+        返回的是结果的浅拷贝,调用方可以自由修改
+        不是由本次调用探测得到的结果(缓存命中或合并到其他查询)带有 "cached": True,
+        记录历史时据此跳过,同一次探测不会被重复计入
+
+        Args:
+            key: 缓存键
+            fetch: 未命中时执行的查询函数,返回值中带有 "error" 的结果不会被缓存
+
+        Returns:
+            查询结果字典
+        """
+        cached = self.get(key)
+        if cached is not None:
+            metrics.status_cache_requests.inc(result="hit")
+            return {**cached, "cached": True}
+
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            metrics.status_cache_requests.inc(result="miss")
+            inflight = asyncio.ensure_future(self._fetch(key, fetch))
+            self._inflight[key] = inflight
+            # shield: 某个等待者被取消时不影响其他等待者共享的查询
+            return dict(await asyncio.shield(inflight))
+
+        metrics.status_cache_requests.inc(result="coalesced")
+        return {**await asyncio.shield(inflight), "cached": True}
+
+    async def _fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        try:
+            result = await fetch()
+            if not result.get("error"):
+                self.set(key, result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
@@ -0,0 +1,250 @@
+"""
+状态卡片渲染模块
+把服务器状态(图标、彩色 MOTD、服务器信息、各节点延迟)绘制成一张 PNG 图片,需要安装 Pillow
+
+渲染在线程池中执行,不阻塞事件循环,参数和返回值都是普通数据
+以下缓存由所有渲染线程共享,预热后渲染一张卡片只需几毫秒:
+- 字体和字形: 每个字形只栅格化一次,之后按颜色直接贴到画布上
+- 背景模板: 按卡片高度缓存,渲染时复制一份再绘制
+- 图标: 按内容哈希缓存解码并缩放后的图标
+"""
+
+import base64
+import io
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    Image = ImageDraw = ImageFont = None
+
+# 未配置字体或配置的字体无法加载时,依次尝试这些常见的中文字体
+FALLBACK_FONTS = (
+    "msyh.ttc", "simhei.ttf",
+    "NotoSansCJK-Regular.ttc", "NotoSansSC-Regular.otf",
+    "wqy-microhei.ttc", "wqy-zenhei.ttc", "DroidSansFallbackFull.ttf"
+)
+
+CARD_WIDTH = 720
+PADDING = 32
+ICON_SIZE = 64
+TITLE_SIZE = 20
+TEXT_SIZE = 16
+LINE_GAP = 6
+SECTION_GAP = 14
+LABEL_WIDTH = 88
+MAX_MOTD_LINES = 2
+
+BACKGROUND_COLOR = (24, 25, 32)
+PANEL_COLOR = (38, 40, 52)
+DIVIDER_COLOR = (66, 69, 86)
+TEXT_COLOR = (230, 230, 235)
+LABEL_COLOR = (150, 155, 172)
+FAILED_COLOR = (255, 85, 85)
+# 延迟不超过阈值(毫秒)时使用的颜色
+LATENCY_COLORS = ((80, (85, 255, 85)), (200, (255, 255, 85)), (float("inf"), (255, 170, 0)))
+
+ICON_CACHE_SIZE = 64
+_icons: "OrderedDict[str, Any]" = OrderedDict()
+_icons_lock = threading.Lock()
+# 同一字体对象不保证可以被多个线程同时使用,栅格化新字形时加锁
+_font_lock = threading.Lock()
+
+
+def available() -> bool:
+    """是否已安装 Pillow"""
+    return Image is not None
+
+
+@lru_cache(maxsize=16)
+def _font(font_path: str, size: int):
+    candidates = ((font_path,) if font_path else ()) + FALLBACK_FONTS
+    for candidate in candidates:
+        try:
+            return ImageFont.truetype(candidate, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size)
+    except TypeError:
+        # Pillow 10.1 之前的默认字体不支持指定大小
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=8192)
+def _glyph(font_path: str, size: int, char: str) -> Tuple[Any, int, int, float]:
+    """栅格化单个字形,返回 (灰度遮罩, 横向偏移, 纵向偏移, 前进宽度),空白字符的遮罩为 None"""
+    with _font_lock:
+        font = _font(font_path, size)
+        advance = font.getlength(char)
+        left, top, right, bottom = font.getbbox(char)
+        if right <= left or bottom <= top:
+            return None, 0, 0, advance
+
+        mask = Image.new("L", (right - left, bottom - top), 0)
+        ImageDraw.Draw(mask).text((-left, -top), char, font=font, fill=255)
+        return mask, left, top, advance
+
+
+def _text_width(text: str, size: int, font_path: str) -> float:
+    return sum(_glyph(font_path, size, char)[3] for char in text)
+
+
+def _draw_text(canvas, x: float, y: int, text: str, color: Tuple[int, int, int], size: int, font_path: str, bold: bool = False, max_x: Optional[float] = None) -> float:
+    """逐字贴上缓存的字形,返回绘制结束的横坐标,超过 max_x 的部分不绘制"""
+    for char in text:
+        mask, dx, dy, advance = _glyph(font_path, size, char)
+        if max_x is not None and x + advance > max_x:
+            break
+        if mask is not None:
+            position = (int(x + dx), y + dy)
+            canvas.paste(color, position, mask)
+            if bold:
+                canvas.paste(color, (position[0] + 1, position[1]), mask)
+        x += advance
+    return x
+
+
+def _wrap(text: str, max_width: float, size: int, font_path: str) -> List[str]:
+    """按宽度逐字换行"""
+    lines, current, width = [], "", 0.0
+    for char in text:
+        advance = _glyph(font_path, size, char)[3]
+        if current and width + advance > max_width:
+            lines.append(current)
+            current, width = "", 0.0
+        current += char
+        width += advance
+    lines.append(current)
+    return lines
+
+
+@lru_cache(maxsize=32)
+def _background(height: int):
+    image = Image.new("RGB", (CARD_WIDTH, height), BACKGROUND_COLOR)
+    ImageDraw.Draw(image).rounded_rectangle(
+        (PADDING // 2, PADDING // 2, CARD_WIDTH - PADDING // 2, height - PADDING // 2),
+        radius=14,
+        fill=PANEL_COLOR
+    )
+    return image
+
+
+def _icon(digest: str, data: Optional[str], path: Optional[str]):
+    """解码并缩放图标,按哈希缓存"""
+    with _icons_lock:
+        icon = _icons.get(digest)
+        if icon is not None:
+            _icons.move_to_end(digest)
+            return icon
+
+    if data:
+        raw = base64.b64decode(data.split(",", 1)[1] if data.startswith("data:") else data)
+        source = Image.open(io.BytesIO(raw))
+    else:
+        source = Image.open(path)
+    # 服务器图标是像素画,用最近邻缩放保持清晰
+    icon = source.convert("RGBA").resize((ICON_SIZE, ICON_SIZE), Image.NEAREST)
+
+    with _icons_lock:
+        _icons[digest] = icon
+        while len(_icons) > ICON_CACHE_SIZE:
+            _icons.popitem(last=False)
+    return icon
+
+
+def _latency_color(latency: Optional[float]) -> Tuple[int, int, int]:
+    if latency is None:
+        return FAILED_COLOR
+    for threshold, color in LATENCY_COLORS:
+        if latency <= threshold:
+            return color
+    return LATENCY_COLORS[-1][1]
+
+
+def render_status_card(card: Dict[str, Any]) -> bytes:
+    """
+    绘制状态卡片
+
+    Args:
+        card: 卡片内容
+            font_path: 字体路径,可为空
+            icon / icon_hash: 服务器图标的 data URI 和内容哈希,没有图标时使用 default_icon
+            default_icon: 默认图标文件路径
+            motd: parse_color_codes 的结果
+            rows: [(标签, 内容)] 服务器信息
+            nodes: [(节点名称, 延迟文本, 延迟毫秒或 None, 是否等待中)] 各节点延迟
+
+    Returns:
+        PNG 图片数据
+    """
+    font_path = card.get("font_path") or ""
+    left = PADDING + 8
+    right = CARD_WIDTH - PADDING - 8
+    text_line = TEXT_SIZE + LINE_GAP
+    title_line = TITLE_SIZE + LINE_GAP
+
+    # 先排版,确定卡片高度
+    motd_lines = card["motd"][:MAX_MOTD_LINES]
+    value_width = right - left - LABEL_WIDTH
+    rows = [(label, _wrap(str(value), value_width, TEXT_SIZE, font_path)) for label, value in card["rows"]]
+    header_height = max(ICON_SIZE, len(motd_lines) * title_line)
+    rows_height = sum(len(lines) for _, lines in rows) * text_line
+    nodes_height = (len(card["nodes"]) + 1) * text_line
+    height = PADDING + 8 + header_height + SECTION_GAP * 4 + rows_height + nodes_height + PADDING + 8
+
+    canvas = _background(height).copy()
+    draw = ImageDraw.Draw(canvas)
+    y = PADDING + 8
+
+    # 图标和 MOTD
+    if card.get("icon"):
+        icon = _icon(card["icon_hash"], card["icon"], None)
+    elif card.get("default_icon"):
+        icon = _icon("default", None, card["default_icon"])
+    else:
+        icon = None
+    if icon is not None:
+        canvas.paste(icon, (left, y + (header_height - ICON_SIZE) // 2), icon)
+
+    motd_x = left + ICON_SIZE + 16
+    motd_y = y + (header_height - len(motd_lines) * title_line) // 2
+    for segments in motd_lines:
+        x = motd_x
+        for text, color, bold in segments:
+            x = _draw_text(canvas, x, motd_y, text, tuple(color), TITLE_SIZE, font_path, bold, max_x=right)
+        motd_y += title_line
+    y += header_height + SECTION_GAP
+
+    draw.line((left, y, right, y), fill=DIVIDER_COLOR, width=1)
+    y += SECTION_GAP
+
+    # 服务器信息
+    for label, lines in rows:
+        _draw_text(canvas, left, y, label, LABEL_COLOR, TEXT_SIZE, font_path)
+        for line in lines:
+            _draw_text(canvas, left + LABEL_WIDTH, y, line, TEXT_COLOR, TEXT_SIZE, font_path)
+            y += text_line
+    y += SECTION_GAP
+
+    draw.line((left, y, right, y), fill=DIVIDER_COLOR, width=1)
+    y += SECTION_GAP
+
+    # 各节点延迟,延迟右对齐
+    _draw_text(canvas, left, y, "节点", LABEL_COLOR, TEXT_SIZE, font_path)
+    _draw_text(canvas, right - _text_width("延迟", TEXT_SIZE, font_path), y, "延迟", LABEL_COLOR, TEXT_SIZE, font_path)
+    y += text_line
+    for name, latency_text, latency, pending in card["nodes"]:
+        latency_x = right - _text_width(latency_text, TEXT_SIZE, font_path)
+        color = LABEL_COLOR if pending else _latency_color(latency)
+        _draw_text(canvas, left, y, name, TEXT_COLOR, TEXT_SIZE, font_path, max_x=latency_x - 16)
+        _draw_text(canvas, latency_x, y, latency_text, color, TEXT_SIZE, font_path)
+        y += text_line
+
+    output = io.BytesIO()
+    # 卡片以纯色块为主,低压缩级别已经足够小,编码更快
+    canvas.save(output, "PNG", compress_level=1)
+    return output.getvalue()
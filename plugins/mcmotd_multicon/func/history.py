@@ -0,0 +1,250 @@
+"""
+查询历史记录模块
+记录每次 Java 版查询中各节点的延迟、在线人数和是否成功,用于 /motdstat 统计
+
+每个 (地址, 节点) 在内存中有一个基于 array 的环形缓冲区,新采样只追加到缓冲区
+后台任务定期把尚未写入的采样批量写入 SQLite,写入在线程中执行,不阻塞事件循环
+同时清理超过保留天数的旧数据
+统计查询由 SQLite 按索引完成,几周的数据也只需几毫秒
+
+数据库路径定义在 config.py 中:MCMOTD_HISTORY_DB_PATH
+"""
+
+import asyncio
+import sqlite3
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from nonebot import get_plugin_config
+from nonebot.log import logger
+
+from ..config import Config
+from .cache import normalize_address
+
+config = get_plugin_config(Config)
+
+
+class SampleRing:
+    """单个 (地址, 节点) 的采样环形缓冲区"""
+
+    __slots__ = ("size", "timestamps", "latencies", "players", "success", "count", "flushed")
+
+    def __init__(self, size: int):
+        self.size = size
+        self.timestamps = array("d", bytes(8 * size))
+        self.latencies = array("d", bytes(8 * size))
+        self.players = array("l", bytes(array("l").itemsize * size))
+        self.success = array("b", bytes(size))
+        # 累计追加的采样数和已写入数据库的采样数
+        self.count = 0
+        self.flushed = 0
+
+    def append(self, timestamp: float, latency: Optional[float], players: Optional[int], success: bool):
+        index = self.count % self.size
+        self.timestamps[index] = timestamp
+        # 用 -1 表示缺失值
+        self.latencies[index] = latency if latency is not None else -1.0
+        self.players[index] = players if players is not None else -1
+        self.success[index] = 1 if success else 0
+        self.count += 1
+
+    def take_pending(self) -> List[Tuple[float, Optional[float], Optional[int], int]]:
+        """取出尚未写入数据库的采样,缓冲区溢出时最旧的采样会丢失"""
+        start = max(self.flushed, self.count - self.size)
+        rows = []
+        for position in range(start, self.count):
+            index = position % self.size
+            latency = self.latencies[index]
+            players = self.players[index]
+            rows.append((
+                self.timestamps[index],
+                latency if latency >= 0 else None,
+                players if players >= 0 else None,
+                self.success[index]
+            ))
+        self.flushed = self.count
+        return rows
+
+
+class HistoryStore:
+    """查询历史记录存储"""
+
+    def __init__(self, db_path: str, ring_size: int, retention_days: int):
+        self.db_path = Path(db_path)
+        self.ring_size = ring_size
+        self.retention_days = retention_days
+        self.rings: Dict[Tuple[str, str], SampleRing] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """在工作线程中打开数据库,首次使用时建表"""
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS samples ("
+                "address TEXT NOT NULL, node TEXT NOT NULL, ts REAL NOT NULL, "
+                "latency REAL, players INTEGER, success INTEGER NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_samples_address_node_ts ON samples (address, node, ts)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_samples_ts ON samples (ts)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def record(self, address: str, node: str, latency: Optional[float], players: Optional[int], success: bool):
+        """记录一次采样"""
+        key = (normalize_address(address), node)
+        ring = self.rings.get(key)
+        if ring is None:
+            ring = self.rings[key] = SampleRing(self.ring_size)
+        ring.append(time.time(), latency, players, success)
+
+    def record_query(self, address: str, local_name: str, local_result: Dict[str, Any], remote_results: List[Dict[str, Any]]):
+        """
+        记录一次查询中本地和所有远程节点的结果
+
+        来自状态缓存或轮询快照的结果(带有 "cached")已经在探测时记录过,不再重复计入
+        """
+        if not local_result.get("cached"):
+            self.record(
+                address, local_name,
+                local_result.get("latency"), local_result.get("players_online"),
+                not local_result.get("error")
+            )
+        for remote in remote_results:
+            # 等待中的客户端没有结果,不计入统计
+            if remote.get("pending"):
+                continue
+            data = remote.get("data") or {}
+            if data.get("cached"):
+                continue
+            success = bool(remote.get("success")) and not data.get("error")
+            # 子节点按查询档位只返回延迟等字段(见 ws/protocol.py),在线人数只由本地节点记录
+            self.record(
+                address, remote.get("name", "未知"),
+                data.get("latency") if success else None,
+                None,
+                success
+            )
+
+    async def flush(self):
+        """把缓冲区中尚未写入的采样写入数据库,并清理过期数据"""
+        async with self._lock:
+            rows = []
+            for (address, node), ring in self.rings.items():
+                rows.extend((address, node, *sample) for sample in ring.take_pending())
+            cutoff = time.time() - self.retention_days * 86400
+            await asyncio.to_thread(self._write, rows, cutoff)
+
+    def _write(self, rows: list, cutoff: float):
+        conn = self._connect()
+        with conn:
+            if rows:
+                conn.executemany(
+                    "INSERT INTO samples (address, node, ts, latency, players, success) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+            conn.execute("DELETE FROM samples WHERE ts < ?", (cutoff,))
+
+    async def query_stats(self, address: str, window_seconds: float) -> Dict[str, Dict[str, Any]]:
+        """
+        统计某地址在时间窗口内各节点的延迟和在线人数
+
+        Returns:
+            节点名称到统计结果的映射
+        """
+        await self.flush()
+        since = time.time() - window_seconds
+        async with self._lock:
+            return await asyncio.to_thread(self._read_stats, normalize_address(address), since)
+
+    def _read_stats(self, address: str, since: float) -> Dict[str, Dict[str, Any]]:
+        conn = self._connect()
+        stats = {}
+        rows = conn.execute(
+            "SELECT node, COUNT(*), SUM(success), COUNT(latency), MIN(latency), AVG(players), MAX(players) "
+            "FROM samples WHERE address = ? AND ts >= ? GROUP BY node ORDER BY node",
+            (address, since)
+        ).fetchall()
+
+        for node, total, succeeded, latency_count, latency_min, players_avg, players_max in rows:
+            params = (address, node, since)
+
+            def latency_at(fraction: float) -> Optional[float]:
+                if not latency_count:
+                    return None
+                offset = min(int(latency_count * fraction), latency_count - 1)
+                return conn.execute(
+                    "SELECT latency FROM samples WHERE address = ? AND node = ? AND ts >= ? "
+                    "AND latency IS NOT NULL ORDER BY latency LIMIT 1 OFFSET ?",
+                    (*params, offset)
+                ).fetchone()[0]
+
+            def players_edge(order: str) -> Optional[int]:
+                row = conn.execute(
+                    "SELECT players FROM samples WHERE address = ? AND node = ? AND ts >= ? "
+                    f"AND players IS NOT NULL ORDER BY ts {order} LIMIT 1",
+                    params
+                ).fetchone()
+                return row[0] if row else None
+
+            stats[node] = {
+                "samples": total,
+                "success_rate": succeeded / total if total else 0.0,
+                "latency_min": latency_min,
+                "latency_median": latency_at(0.5),
+                "latency_p95": latency_at(0.95),
+                "players_avg": players_avg,
+                "players_max": players_max,
+                "players_first": players_edge("ASC"),
+                "players_last": players_edge("DESC")
+            }
+        return stats
+
+    def start(self, flush_interval: int):
+        """启动定期写入任务"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(flush_interval))
+
+    async def stop(self):
+        """停止定期写入任务并写入剩余采样"""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error(f"写入查询历史失败: {e}")
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def _run(self, flush_interval: int):
+        while True:
+            await asyncio.sleep(flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"写入查询历史失败: {e}")
+
+
+# 全局实例
+_history_store: Optional[HistoryStore] = None
+
+
+def get_history_store() -> HistoryStore:
+    """获取查询历史记录实例"""
+    global _history_store
+    if _history_store is None:
+        _history_store = HistoryStore(
+            config.MCMOTD_HISTORY_DB_PATH,
+            config.MCMOTD_HISTORY_RING_SIZE,
+            config.MCMOTD_HISTORY_RETENTION_DAYS
+        )
+    return _history_store
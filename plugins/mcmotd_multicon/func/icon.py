@@ -0,0 +1,117 @@
+"""
+服务器图标模块
+图标按内容哈希标识,客户端只向主干节点发送图标哈希
+主干节点用 IconStore 记住见过的图标,只在遇到新哈希时才向客户端索取图标内容
+发送给 OneBot 实现时,IconFileCache 把图标按哈希解码写入本地目录,消息中只引用文件路径
+"""
+
+import base64
+import hashlib
+import os
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+
+def icon_hash(icon: Optional[str]) -> Optional[str]:
+    """计算图标的内容哈希,没有图标时返回 None"""
+    if not icon:
+        return None
+    return hashlib.sha1(icon.encode()).hexdigest()
+
+
+class IconStore:
+    """按哈希保存图标的 LRU 存储"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._icons: "OrderedDict[str, str]" = OrderedDict()
+
+    def __contains__(self, digest: str) -> bool:
+        return digest in self._icons
+
+    def get(self, digest: Optional[str]) -> Optional[str]:
+        """按哈希获取图标,不存在时返回 None"""
+        if digest is None or digest not in self._icons:
+            return None
+        self._icons.move_to_end(digest)
+        return self._icons[digest]
+
+    def put(self, icon: Optional[str]) -> Optional[str]:
+        """保存图标并返回其哈希"""
+        digest = icon_hash(icon)
+        if digest is None:
+            return None
+
+        self._icons[digest] = icon
+        self._icons.move_to_end(digest)
+        while len(self._icons) > self.max_size:
+            self._icons.popitem(last=False)
+        return digest
+
+
+def decode_icon(icon: str) -> bytes:
+    """把 data URI 或 base64 形式的图标解码为图片数据"""
+    if icon.startswith("data:"):
+        icon = icon.split(",", 1)[1]
+    return base64.b64decode(icon)
+
+
+class IconFileCache:
+    """
+    按哈希把图标写入本地目录的 LRU 缓存
+    每个图标只解码和写入一次,超过数量上限时删除最久未使用的文件
+    """
+
+    def __init__(self, directory: str, max_files: int):
+        self.directory = Path(directory)
+        self.max_files = max_files
+        self._files: "OrderedDict[str, Path]" = OrderedDict()
+        self._loaded = False
+
+    def _load(self):
+        """首次使用时创建目录,并按修改时间接管上次运行留下的文件"""
+        self._loaded = True
+        self.directory.mkdir(parents=True, exist_ok=True)
+        existing = sorted(self.directory.glob("*.png"), key=lambda path: path.stat().st_mtime)
+        for path in existing:
+            self._files[path.stem] = path.resolve()
+        self._evict()
+
+    def _evict(self):
+        while len(self._files) > self.max_files:
+            _, path = self._files.popitem(last=False)
+            path.unlink(missing_ok=True)
+
+    def get_path(self, icon: Optional[str], digest: Optional[str] = None) -> Optional[Path]:
+        """
+        获取图标的本地文件路径,文件不存在时解码写入
+
+        Args:
+            icon: data URI 或 base64 形式的图标
+            digest: 图标哈希,为空时根据内容计算
+
+        Returns:
+            图标文件的绝对路径,没有图标时返回 None
+        """
+        if not icon:
+            return None
+        digest = digest or icon_hash(icon)
+        if not self._loaded:
+            self._load()
+
+        path = self._files.get(digest)
+        if path is not None and path.exists():
+            self._files.move_to_end(digest)
+            return path
+
+        path = (self.directory / f"{digest}.png").resolve()
+        # 先写临时文件再改名,OneBot 实现不会读到写了一半的文件
+        temp_path = path.with_suffix(".tmp")
+        temp_path.write_bytes(decode_icon(icon))
+        os.replace(temp_path, path)
+
+        self._files[digest] = path
+        self._files.move_to_end(digest)
+        self._evict()
+        return path
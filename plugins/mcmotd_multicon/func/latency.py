@@ -0,0 +1,156 @@
+"""
+多次采样延迟模块
+对同一服务器连续发出多个延迟探测,统计最低、平均、p95、抖动和丢包率,便于比较不同节点的线路质量
+
+探测按固定间隔依次发出,不等待上一个探测返回,总耗时约为 (次数 - 1) * 间隔 + 单次延迟
+- Java 版: 每个采样是一次独立的 ping(握手包 + ping 包)或 tcping,服务器回复 pong 后即关闭连接
+- Bedrock 版: 所有 RakNet 未连接 Ping 从同一个 UDP 套接字发出,按回显的时间戳字段匹配 Pong
+"""
+
+import asyncio
+import math
+import random
+import struct
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# RakNet 离线消息标识
+RAKNET_MAGIC = bytes.fromhex("00ffff00fefefefefdfdfdfd12345678")
+UNCONNECTED_PING = 0x01
+UNCONNECTED_PONG = 0x1C
+
+
+def summarize(samples: List[Optional[float]]) -> Dict[str, Any]:
+    """
+    统计延迟采样
+
+    Args:
+        samples: 按发出顺序排列的延迟(毫秒),丢失的采样为 None
+
+    Returns:
+        包含 min、avg、p95、jitter(相邻采样之差的平均值)、loss(丢包率 0~1)、samples(采样数)的字典,
+        全部丢失时 min、avg、p95、jitter 为 None
+    """
+    received = [sample for sample in samples if sample is not None]
+    stats: Dict[str, Any] = {
+        "min": None,
+        "avg": None,
+        "p95": None,
+        "jitter": None,
+        "loss": 1 - len(received) / len(samples) if samples else 1.0,
+        "samples": len(samples)
+    }
+    if not received:
+        return stats
+
+    ordered = sorted(received)
+    stats["min"] = ordered[0]
+    stats["avg"] = sum(received) / len(received)
+    # 最近秩法,采样较少时 p95 即为最大值
+    stats["p95"] = ordered[max(math.ceil(0.95 * len(ordered)) - 1, 0)]
+    stats["jitter"] = (
+        sum(abs(b - a) for a, b in zip(received, received[1:])) / (len(received) - 1)
+        if len(received) > 1 else 0.0
+    )
+    return stats
+
+
+async def sample(probe: Callable[[], Awaitable[float]], count: int, interval: float, timeout: float) -> List[Optional[float]]:
+    """
+    按间隔发出 count 个探测,不等待上一个探测返回
+
+    Args:
+        probe: 单次探测,返回延迟(毫秒)
+        count: 采样次数
+        interval: 相邻探测的发出间隔(秒)
+        timeout: 单次探测的超时时间(秒)
+
+    Returns:
+        按发出顺序排列的延迟,超时或失败的采样为 None
+    """
+    async def run(index: int) -> Optional[float]:
+        await asyncio.sleep(index * interval)
+        try:
+            return await asyncio.wait_for(probe(), timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            return None
+
+    return list(await asyncio.gather(*(run(index) for index in range(count))))
+
+
+class _RakNetPingProtocol(asyncio.DatagramProtocol):
+    """在一个 UDP 套接字上发出多个未连接 Ping,按回显的时间戳字段匹配 Pong"""
+
+    def __init__(self, base: int, count: int):
+        self.base = base
+        self.count = count
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        # 时间戳字段 -> 发出时间
+        self.sent: Dict[int, float] = {}
+        self.rtts: Dict[int, float] = {}
+        self.done: Optional[asyncio.Future] = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        if len(data) < 9 or data[0] != UNCONNECTED_PONG:
+            return
+        token = struct.unpack(">q", data[1:9])[0]
+        sent_at = self.sent.get(token)
+        if sent_at is None or token in self.rtts:
+            return
+        self.rtts[token] = (time.perf_counter() - sent_at) * 1000
+        # 只有全部 Ping 都已发出并收到 Pong 才算完成,不能只比较已发出的数量
+        if len(self.rtts) == self.count and self.done is not None and not self.done.done():
+            self.done.set_result(None)
+
+    def error_received(self, exc):
+        pass
+
+    def send(self, index: int):
+        token = self.base + index
+        packet = (
+            bytes([UNCONNECTED_PING]) + struct.pack(">q", token) + RAKNET_MAGIC
+            + struct.pack(">q", random.getrandbits(63))
+        )
+        self.sent[token] = time.perf_counter()
+        self.transport.sendto(packet)
+
+
+async def raknet_ping(ip: str, port: int, count: int, interval: float, timeout: float) -> List[Optional[float]]:
+    """
+    对 Bedrock 服务器发出 count 个 RakNet 未连接 Ping
+
+    Args:
+        ip: 服务器 IP 地址
+        port: 服务器端口
+        count: 采样次数
+        interval: 相邻 Ping 的发出间隔(秒)
+        timeout: 最后一个 Ping 发出后等待 Pong 的时间(秒)
+
+    Returns:
+        按发出顺序排列的延迟(毫秒),未收到 Pong 的采样为 None
+    """
+    loop = asyncio.get_running_loop()
+    # 时间戳字段只用于匹配,取随机起点避免与其他客户端的 Ping 混淆
+    base = random.getrandbits(48)
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: _RakNetPingProtocol(base, count), remote_addr=(ip, port)
+    )
+    protocol.done = loop.create_future()
+    try:
+        for index in range(count):
+            if index:
+                await asyncio.sleep(interval)
+            protocol.send(index)
+        try:
+            await asyncio.wait_for(asyncio.shield(protocol.done), timeout)
+        except asyncio.TimeoutError:
+            pass
+    finally:
+        transport.close()
+
+    return [protocol.rtts.get(base + index) for index in range(count)]
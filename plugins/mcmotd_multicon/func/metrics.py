@@ -0,0 +1,201 @@
+"""
+运行指标模块
+以 Prometheus 文本格式导出插件的运行指标,由主干节点 FastAPI 服务器的 /metrics 提供
+只实现了用到的 Counter、Gauge、Histogram 三种指标,不依赖 prometheus_client
+
+指标一览:
+- mcmotd_connected_nodes: 已连接的客户端数量
+- mcmotd_pending_requests: 等待客户端响应的请求数量
+- mcmotd_node_response_seconds: 各客户端的响应时间
+- mcmotd_node_failures_total: 各客户端的超时和错误次数
+- mcmotd_probe_duration_seconds: 本地探测耗时,按版本区分
+- mcmotd_status_cache_requests_total: 状态缓存命中情况
+- mcmotd_dns_cache_requests_total: DNS 缓存命中情况
+- mcmotd_queries_active / mcmotd_queries_queued: 正在执行和排队中的查询命令数量
+- mcmotd_queries_rejected_total: 被限流或因队列已满被拒绝的查询命令数量
+"""
+
+import math
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Metric(ABC):
+    """指标基类"""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """指标的样本行,不含 HELP 和 TYPE"""
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+            *self.samples()
+        ]
+
+
+class Counter(Metric):
+    """只增不减的计数器"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in self._values.items()
+        ]
+
+
+class Gauge(Metric):
+    """可增可减的数值,也可以在导出时调用函数取值"""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels: str):
+        self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float]):
+        """导出时调用 function 取值,适用于没有标签的指标"""
+        self._function = function
+
+    def samples(self) -> List[str]:
+        if self._function is not None:
+            return [f"{self.name} {_format_value(self._function())}"]
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in self._values.items()
+        ]
+
+
+class Histogram(Metric):
+    """按桶统计分布的直方图"""
+
+    type_name = "histogram"
+
+    DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # 每组标签: (各桶计数, 总和, 总数)
+        self._values: Dict[LabelValues, List] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        entry = self._values.get(key)
+        if entry is None:
+            entry = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                entry[0][index] += 1
+                break
+        entry[1] += value
+        entry[2] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.label_names, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """导出为 Prometheus 文本格式"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+connected_nodes: Gauge = registry.register(Gauge(
+    "mcmotd_connected_nodes", "已连接的客户端数量"
+))
+pending_requests: Gauge = registry.register(Gauge(
+    "mcmotd_pending_requests", "等待客户端响应的请求数量"
+))
+node_response_seconds: Histogram = registry.register(Histogram(
+    "mcmotd_node_response_seconds", "客户端从下发查询到返回响应的时间", ["node"]
+))
+node_failures: Counter = registry.register(Counter(
+    "mcmotd_node_failures_total", "客户端查询失败次数", ["node", "reason"]
+))
+probe_duration_seconds: Histogram = registry.register(Histogram(
+    "mcmotd_probe_duration_seconds", "本地探测服务器状态的耗时", ["edition", "result"]
+))
+status_cache_requests: Counter = registry.register(Counter(
+    "mcmotd_status_cache_requests_total", "状态缓存请求次数", ["result"]
+))
+dns_cache_requests: Counter = registry.register(Counter(
+    "mcmotd_dns_cache_requests_total", "DNS 缓存请求次数", ["result"]
+))
+queries_active: Gauge = registry.register(Gauge(
+    "mcmotd_queries_active", "正在执行的查询命令数量"
+))
+queries_queued: Gauge = registry.register(Gauge(
+    "mcmotd_queries_queued", "排队等待执行的查询命令数量"
+))
+queries_rejected: Counter = registry.register(Counter(
+    "mcmotd_queries_rejected_total", "被拒绝的查询命令数量", ["reason"]
+))
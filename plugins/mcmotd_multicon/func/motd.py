@@ -3,20 +3,29 @@ McMotd Minecraft 服务器状态查询模块
 使用类重写并集成 Java 和 Bedrock
 """
 
+import asyncio
+import socket
+
 from nonebot import get_plugin_config
 from nonebot.log import logger
 from mcstatus import JavaServer, BedrockServer
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 
 from ..config import Config
+from .latency import raknet_ping, sample, summarize
 
 config = get_plugin_config(Config)
 
+# 多次采样时单个探测的超时时间(秒)
+SAMPLE_TIMEOUT = 3.0
+
 
 class Motd:
-    def __init__(self, address: str, port: int = None):
+    def __init__(self, address: str, port: int = None, ip: str = None):
         self.address = address
         self.port = port
+        # 已解析的 IP 地址,传入后不再重复解析
+        self.ip = ip
 
     async def java_status(self, address: str, port: int = None) -> Dict[str, Any]:
         """
@@ -33,29 +42,33 @@ class Motd:
         port = self.port
         
         # 查询服务器
-        # 如果有端口,则传入 host:port
+        # 如果有端口,说明已经解析过 SRV 记录,直接连接,握手包仍使用主机名以兼容按域名分流的代理端
         if port is not None:
-            server = JavaServer.lookup(f"{address}:{port}")
+            server = JavaServer(address, port)
         # 如果没有端口,他可能是默认端口,或者是 SRV 记录,mcstatus 会自动处理请求
         else:
             server = JavaServer.lookup(f"{address}")
         
-        status = await server.async_status()
+        # Query 协议与 Server List Ping 同时进行,不增加查询耗时
+        query_task = asyncio.ensure_future(self._java_query()) if config.MCMOTD_JAVA_QUERY else None
+        # 多次延迟采样同样与状态查询同时进行
+        samples_task = asyncio.ensure_future(self._java_samples(server)) if config.MCMOTD_LATENCY_SAMPLES > 1 else None
+        try:
+            status = await server.async_status()
+        except BaseException:
+            for task in (query_task, samples_task):
+                if task is not None:
+                    task.cancel()
+            raise
 
         # 延迟
-        if config.MCMOTD_EXPERIMENTAL_LATENCY_CHECK:
-            try:
-                from .networktools_cpp import entrypoint
-                tcping_result = await entrypoint.tcping(address, port or 25565, timeout=3000)
-                latency = tcping_result.get("avg_rtt") if tcping_result.get("status") == "success" else status.latency
-                is_experimental_latency = True
-            except Exception as e:
-                logger.error(f"实验性延迟检测失败 [{address}:{port or 25565}]: {type(e).__name__}: {e}")
-                latency = status.latency
-                is_experimental_latency = False
+        latency_stats = None
+        if samples_task is not None:
+            samples, is_experimental_latency = await samples_task
+            latency_stats = summarize(samples)
+            latency = latency_stats["avg"] if latency_stats["avg"] is not None else status.latency
         else:
-            latency = status.latency
-            is_experimental_latency = False
+            latency, is_experimental_latency = await self._java_latency(status.latency)
         
         # 提取玩家列表
         players_list = []
@@ -72,7 +85,7 @@ class Motd:
         else:
             motd = str(motd)
         
-        return {
+        result = {
             "motd": motd,
             "version": status.version.name,
             "players_online": status.players.online,
@@ -82,6 +95,114 @@ class Motd:
             "is_experimental_latency": is_experimental_latency,
             "icon": icon
         }
+        if latency_stats is not None:
+            result["latency_stats"] = latency_stats
+        
+        # 服务器开启了 Query 时使用完整的玩家列表,并补充地图和插件信息
+        query = await query_task if query_task is not None else None
+        if query is not None:
+            result["players_list"] = query["players_list"]
+            result["map"] = query["map"]
+            result["server_mod"] = query["server_mod"]
+            result["plugins"] = query["plugins"]
+        
+        return result
+    
+    async def java_latency(self) -> Dict[str, Any]:
+        """
+        只测量 Java 版服务器延迟
+        只发送握手包和 ping 包,不请求状态 JSON,服务器不会返回 MOTD、玩家列表和图标
+        
+        Returns:
+            只包含延迟信息的字典
+        """
+
+        address = self.address
+        port = self.port
+        
+        if port is not None:
+            server = JavaServer(address, port)
+        else:
+            server = JavaServer.lookup(f"{address}")
+        
+        if config.MCMOTD_LATENCY_SAMPLES > 1:
+            samples, is_experimental_latency = await self._java_samples(server)
+            latency_stats = summarize(samples)
+            if latency_stats["avg"] is None:
+                raise ConnectionError("所有延迟采样均失败")
+            return {
+                "latency": latency_stats["avg"],
+                "is_experimental_latency": is_experimental_latency,
+                "latency_stats": latency_stats
+            }
+        
+        latency, is_experimental_latency = await self._java_latency(await server.async_ping())
+        return {
+            "latency": latency,
+            "is_experimental_latency": is_experimental_latency
+        }
+    
+    async def _java_samples(self, server: JavaServer) -> Tuple[List[Optional[float]], bool]:
+        """
+        多次采样 Java 版服务器延迟,返回 (按发出顺序排列的采样, 是否为实验性延迟)
+        启用实验性延迟检测时每个采样是一次 C++ tcping,否则是一次 ping
+        """
+        probe = server.async_ping
+        is_experimental_latency = False
+        if config.MCMOTD_EXPERIMENTAL_LATENCY_CHECK:
+            try:
+                from .networktools_cpp import entrypoint
+                
+                async def probe():
+                    tcping_result = await entrypoint.tcping(self.ip or self.address, self.port or 25565, timeout=int(SAMPLE_TIMEOUT * 1000))
+                    if tcping_result.get("status") != "success":
+                        raise ConnectionError(tcping_result.get("error"))
+                    return tcping_result["avg_rtt"]
+                
+                is_experimental_latency = True
+            except Exception as e:
+                logger.error(f"实验性延迟检测不可用: {type(e).__name__}: {e}")
+        
+        samples = await sample(probe, config.MCMOTD_LATENCY_SAMPLES, config.MCMOTD_LATENCY_SAMPLE_INTERVAL, SAMPLE_TIMEOUT)
+        return samples, is_experimental_latency
+    
+    async def _resolve_ip(self, port: int) -> str:
+        """获取服务器 IP 地址,未传入已解析的 IP 时解析一次"""
+        if self.ip is not None:
+            return self.ip
+        infos = await asyncio.get_running_loop().getaddrinfo(self.address, port, type=socket.SOCK_DGRAM)
+        return infos[0][4][0]
+    
+    async def _java_query(self) -> Optional[Dict[str, Any]]:
+        """通过 Query 协议查询完整状态,服务器未开启 Query 或查询失败时返回 None"""
+        from .query import get_query_client
+        
+        address = self.address
+        port = config.MCMOTD_JAVA_QUERY_PORT or self.port or 25565
+        try:
+            ip = await self._resolve_ip(port)
+            return await get_query_client().full_stat(ip, port, config.MCMOTD_JAVA_QUERY_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.debug(f"Query 查询超时,服务器可能未开启 enable-query [{address}:{port}]")
+        except Exception as e:
+            logger.debug(f"Query 查询失败 [{address}:{port}]: {type(e).__name__}: {e}")
+        return None
+    
+    async def _java_latency(self, fallback: float) -> Tuple[float, bool]:
+        """启用实验性延迟检测时改用 C++ tcping 的结果,返回 (延迟, 是否为实验性延迟)"""
+        if not config.MCMOTD_EXPERIMENTAL_LATENCY_CHECK:
+            return fallback, False
+        
+        address = self.address
+        port = self.port
+        try:
+            from .networktools_cpp import entrypoint
+            tcping_result = await entrypoint.tcping(self.ip or address, port or 25565, timeout=3000)
+            latency = tcping_result.get("avg_rtt") if tcping_result.get("status") == "success" else fallback
+            return latency, True
+        except Exception as e:
+            logger.error(f"实验性延迟检测失败 [{address}:{port or 25565}]: {type(e).__name__}: {e}")
+            return fallback, False
     
     async def bedrock_status(self, address: str, port: int = None) -> Dict[str, Any]:
         """
@@ -98,17 +219,29 @@ class Motd:
         port = self.port
         
         # 查询服务器
-        # 如果有端口,则传入 host:port
+        # 如果有端口,则直接连接,Bedrock 协议不需要主机名,有已解析的 IP 时直接使用
         if port is not None:
-            server = BedrockServer.lookup(f"{address}:{port}")
+            server = BedrockServer(self.ip or address, port)
         # 如果没有端口,他可能是默认端口,mcstatus 会自动处理请求
         else:
             server = BedrockServer.lookup(f"{address}")
         
-        status = await server.async_status()
+        # 多次采样时所有 RakNet Ping 从同一个套接字发出,与状态查询同时进行
+        samples_task = asyncio.ensure_future(self._bedrock_samples()) if config.MCMOTD_LATENCY_SAMPLES > 1 else None
+        try:
+            status = await server.async_status()
+        except BaseException:
+            if samples_task is not None:
+                samples_task.cancel()
+            raise
 
         # 延迟
         latency = status.latency
+        latency_stats = None
+        if samples_task is not None:
+            latency_stats = summarize(await samples_task)
+            if latency_stats["avg"] is not None:
+                latency = latency_stats["avg"]
 
         # 转换 MOTD
         motd = status.description
@@ -117,13 +250,26 @@ class Motd:
         else:
             motd = str(motd)
 
-        return {
+        result = {
             "motd": motd,
-            "version": status.version.version,
+            "version": status.version.name,
             "players_online": status.players.online,
             "players_max": status.players.max,
             "map_name": status.map_name if hasattr(status, 'map_name') else "未知",
             "game_mode": status.gamemode if hasattr(status, 'gamemode') else "未知",
             "latency": latency,
             "is_experimental_latency": False
-        }
\ No newline at end of file
+        }
+        if latency_stats is not None:
+            result["latency_stats"] = latency_stats
+        return result
+    
+    async def _bedrock_samples(self) -> List[Optional[float]]:
+        """多次采样 Bedrock 版服务器延迟,返回按发出顺序排列的采样"""
+        port = self.port or 19132
+        try:
+            ip = await self._resolve_ip(port)
+            return await raknet_ping(ip, port, config.MCMOTD_LATENCY_SAMPLES, config.MCMOTD_LATENCY_SAMPLE_INTERVAL, SAMPLE_TIMEOUT)
+        except Exception as e:
+            logger.debug(f"Bedrock 延迟采样失败 [{self.address}:{port}]: {type(e).__name__}: {e}")
+            return [None] * config.MCMOTD_LATENCY_SAMPLES
\ No newline at end of file
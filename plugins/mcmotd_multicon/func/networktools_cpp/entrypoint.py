@@ -1,11 +1,21 @@
 """
 networktools_cpp 封装模块
 提供对 C++ 网络工具的 Python 接口
+
+C++ 函数是阻塞调用,这里统一放到有上限的线程池中执行,避免卡住事件循环
+扩展在阻塞期间释放 GIL 时,多个探测可以真正并行
+线程池大小由 MCMOTD_PROBE_WORKERS 配置
 """
 
+import asyncio
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import TypedDict, Literal
+from typing import Any, Callable, Optional, TypedDict, Literal
+
+from nonebot import get_plugin_config
+
+from ...config import Config
 
 # 添加 C++ 模块路径（就在当前目录）
 cpp_module_path = Path(__file__).parent
@@ -13,6 +23,35 @@ sys.path.insert(0, str(cpp_module_path))
 
 import networktools_cpp
 
+config = get_plugin_config(Config)
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """获取探测线程池,首次使用时创建"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=config.MCMOTD_PROBE_WORKERS,
+            thread_name_prefix="networktools_cpp"
+        )
+    return _executor
+
+
+async def _run_in_pool(func: Callable[..., Any], *args: Any) -> Any:
+    """在探测线程池中执行阻塞的 C++ 调用"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), func, *args)
+
+
+def shutdown():
+    """关闭探测线程池"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
 
 class PingResult(TypedDict):
     """Ping 结果"""
@@ -52,7 +91,7 @@ async def ping(dest: str, count: int = 4, ttl: int = 64, timeout: int = 1000) ->
         PingResult 字典
     """
     try:
-        result = networktools_cpp.ping(dest, count, ttl, timeout)
+        result = await _run_in_pool(networktools_cpp.ping, dest, count, ttl, timeout)
         return result
     except Exception as e:
         return {
@@ -78,7 +117,7 @@ async def pingv6(dest: str, count: int = 4, ttl: int = 64, timeout: int = 1000)
         PingResult 字典
     """
     try:
-        result = networktools_cpp.pingv6(dest, count, ttl, timeout)
+        result = await _run_in_pool(networktools_cpp.pingv6, dest, count, ttl, timeout)
         return result
     except Exception as e:
         return {
@@ -103,7 +142,7 @@ async def tracert(dest: str, max_hops: int = 30, timeout: int = 1000) -> Tracert
         TracertResult 字典
     """
     try:
-        result = networktools_cpp.tracert(dest, max_hops, timeout)
+        result = await _run_in_pool(networktools_cpp.tracert, dest, max_hops, timeout)
         return result
     except Exception as e:
         return {
@@ -126,7 +165,7 @@ async def tcping(dest: str, port: int, timeout: int = 1000) -> TcpingResult:
         TcpingResult 字典
     """
     try:
-        result = networktools_cpp.tcping(dest, port, timeout)
+        result = await _run_in_pool(networktools_cpp.tcping, dest, port, timeout)
         return result
     except Exception as e:
         return {
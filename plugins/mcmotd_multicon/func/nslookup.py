@@ -4,62 +4,268 @@
 所以要另外解析 SRV 记录
 顺序：
 解析 SRV 记录-解析目标域名和端口-解析目标域名 A/AAAA 记录-返回 IP 地址和端口
+
+解析使用 dnspython 的异步解析器,不会阻塞事件循环
+解析结果按记录的 TTL 缓存,查不到记录的否定结果也会缓存一段时间
+解析出的目标主机、端口和 IP 会一路传给查询流程,每次查询只解析一次
 """
 
+import asyncio
+import ipaddress
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+import dns.asyncresolver
+import dns.exception
 import dns.resolver
+from nonebot import get_plugin_config
+from nonebot.log import logger
+
+from ..config import Config
+from . import metrics
+
+config = get_plugin_config(Config)
+
+# 这些异常表示"没有这条记录",可以作为否定结果缓存
+NEGATIVE_ERRORS = (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN, dns.resolver.NoNameservers)
+
+JAVA_DEFAULT_PORT = 25565
+BEDROCK_DEFAULT_PORT = 19132
+
+
+class DnsCache:
+    """按记录 TTL 过期的 DNS 缓存"""
+
+    def __init__(self, negative_ttl: float, max_size: int):
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Tuple[bool, Any]:
+        """返回 (是否命中, 缓存值),否定结果的缓存值为 None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return False, None
+
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(self, key: Hashable, value: Any, ttl: float):
+        if ttl <= 0:
+            return
+
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+dns_cache = DnsCache(config.MCMOTD_DNS_NEGATIVE_TTL, config.MCMOTD_DNS_CACHE_SIZE)
+# 正在进行的解析,同一条记录同时只解析一次
+_inflight: Dict[Hashable, asyncio.Future] = {}
+_resolver: Optional[dns.asyncresolver.Resolver] = None
+
+
+def _get_resolver() -> dns.asyncresolver.Resolver:
+    global _resolver
+    if _resolver is None:
+        _resolver = dns.asyncresolver.Resolver()
+    return _resolver
+
+
+async def resolve(name: str, rdtype: str) -> Optional[list]:
+    """
+    异步解析 DNS 记录并缓存
+
+    Args:
+        name: 域名
+        rdtype: 记录类型,如 "SRV"、"A"、"AAAA"
+
+    Returns:
+        记录列表,没有该记录时返回 None
+    """
+    key = (name.lower().rstrip("."), rdtype)
+    hit, value = dns_cache.get(key)
+    if hit:
+        metrics.dns_cache_requests.inc(result="hit")
+        return value
+
+    inflight = _inflight.get(key)
+    if inflight is None:
+        metrics.dns_cache_requests.inc(result="miss")
+        inflight = asyncio.ensure_future(_resolve_uncached(key, name, rdtype))
+        _inflight[key] = inflight
+    else:
+        metrics.dns_cache_requests.inc(result="coalesced")
+    return await asyncio.shield(inflight)
+
+
+async def _resolve_uncached(key: Hashable, name: str, rdtype: str) -> Optional[list]:
+    try:
+        try:
+            answer = await _get_resolver().resolve(name, rdtype)
+        except NEGATIVE_ERRORS as e:
+            logger.debug(f"未找到 {rdtype} 记录 [{name}]: {e}")
+            dns_cache.set(key, None, dns_cache.negative_ttl)
+            return None
+
+        records = list(answer)
+        dns_cache.set(key, records, answer.rrset.ttl)
+        return records
+    finally:
+        _inflight.pop(key, None)
+
+
+def is_ip_address(host: str) -> bool:
+    """判断是否为 IP 地址字面量"""
+    try:
+        ipaddress.ip_address(host)
+        return True
+    except ValueError:
+        return False
+
+
+def split_host_port(address: str | int) -> Tuple[str, Optional[int]]:
+    """
+    拆分地址中的主机和端口
+
+    支持 host、host:port、[IPv6]:port 和不带端口的 IPv6 地址
+
+    Returns:
+        (主机, 端口),未指定端口时端口为 None
+    """
+    address = str(address).strip()
+
+    if address.startswith("["):
+        host, _, rest = address[1:].partition("]")
+        port = rest[1:] if rest.startswith(":") else ""
+    elif address.count(":") == 1:
+        host, _, port = address.partition(":")
+    else:
+        host, port = address, ""
+
+    if not port:
+        return host, None
+    if not port.isdigit() or not 0 < int(port) < 65536:
+        raise ValueError(f"端口无效: {port}")
+    return host, int(port)
+
 
 class Nslookup:
     def __init__(self, address: str):
         self.address = address
 
+    async def _lookup(self, rdtype: str) -> Optional[list]:
+        """解析 A/AAAA 记录,解析超时等 DNS 错误按没有记录处理,交给后续的系统解析器兜底"""
+        try:
+            return await resolve(self.address, rdtype)
+        except dns.exception.DNSException as e:
+            logger.debug(f"{rdtype} 记录解析失败 [{self.address}]: {e}")
+            return None
+
     async def nslookup_srv(self) -> tuple[str, int]:
         """
         解析 SRV 记录
-        
+
         参数:
-            address: 服务器地址,格式: host:port 或 host
-            default_port: 默认端口
-        
+            address: 服务器地址,格式: host
+
         返回:
-            包含目标主机名和端口的元组
+            包含目标主机名、端口和是否存在 SRV 记录的元组
         """
         address = self.address
 
         try:
-            answers = dns.resolver.resolve(address, 'SRV')
-            for rdata in answers:
-                new_address = str(rdata.target).rstrip('.')
-                port = rdata.port
-                return new_address, port, True
-        except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN, dns.resolver.NoNameservers) as e:
-            print("No SRV record found:", e)
-        
+            answers = await resolve(f"_minecraft._tcp.{address}", "SRV")
+        except dns.exception.DNSException as e:
+            # 解析超时等情况按没有 SRV 记录处理,不影响后续查询
+            logger.debug(f"SRV 记录解析失败 [{address}]: {e}")
+            answers = None
+
+        if answers:
+            rdata = answers[0]
+            new_address = str(rdata.target).rstrip('.')
+            port = rdata.port
+            return new_address, port, True
+
         # 如果 SRV 解析失败，返回原地址
         return address, None, False
 
     async def nslookup_a_4a(self) -> list[str]:
         """
         解析 A 和 AAAA 记录
-        
+
         参数:
             address: 服务器地址,格式: host
-        
+
         返回:
             包含所有解析到的 IPv4 和 IPv6 地址的列表
         """
+        answers_a, answers_aaaa = await asyncio.gather(
+            self._lookup('A'),
+            self._lookup('AAAA')
+        )
+        return [
+            str(answers_a[0]) if answers_a else None,
+            str(answers_aaaa[0]) if answers_aaaa else None
+        ]
+
+    async def nslookup_ip(self) -> str:
+        """
+        解析主机的 IP 地址,优先使用 IPv4
+
+        返回:
+            IP 地址,主机本身就是 IP 时原样返回
+        """
         address = self.address
-        ip_addresses = []
-        try:
-            answers_a = dns.resolver.resolve(address, 'A')
-            ip_addresses.append(str(answers_a[0]))
-        except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN, dns.resolver.NoNameservers):
-            ip_addresses.append(None)
-        
+        if is_ip_address(address):
+            return address
+
+        answers_a = await self._lookup('A')
+        if answers_a:
+            return str(answers_a[0])
+
+        answers_aaaa = await self._lookup('AAAA')
+        if answers_aaaa:
+            return str(answers_aaaa[0])
+
+        # DNS 查不到或解析出错时交给系统解析器兜底(例如 hosts 文件中的名称),在线程池中执行不阻塞事件循环
         try:
-            answers_aaaa = dns.resolver.resolve(address, 'AAAA')
-            ip_addresses.append(str(answers_aaaa[0]))
-        except (dns.resolver.NoAnswer, dns.resolver.NXDOMAIN, dns.resolver.NoNameservers):
-            ip_addresses.append(None)
-        
-        return ip_addresses
+            infos = await asyncio.get_running_loop().getaddrinfo(address, None)
+        except OSError:
+            infos = []
+        if infos:
+            return infos[0][4][0]
+
+        raise ValueError(f"无法解析域名: {address}")
+
+    async def resolve_java(self) -> Tuple[str, int, str]:
+        """
+        按 Java 版规则解析地址: 未指定端口时先查 SRV 记录,再解析目标主机的 IP
 
+        返回:
+            (目标主机名, 端口, IP 地址)
+        """
+        host, port = split_host_port(self.address)
+        if port is None and not is_ip_address(host):
+            host, port, _ = await Nslookup(host).nslookup_srv()
+
+        ip = await Nslookup(host).nslookup_ip()
+        return host, port or JAVA_DEFAULT_PORT, ip
+
+    async def resolve_bedrock(self) -> Tuple[str, int, str]:
+        """
+        按 Bedrock 版规则解析地址,Bedrock 没有 SRV 记录
+
+        返回:
+            (主机名, 端口, IP 地址)
+        """
+        host, port = split_host_port(self.address)
+        ip = await Nslookup(host).nslookup_ip()
+        return host, port or BEDROCK_DEFAULT_PORT, ip
@@ -0,0 +1,185 @@
+"""
+后台状态轮询模块
+定期查询开启轮询的群通过 /addmotd 保存的服务器,在内存中保留上一次通知时的状态
+只在状态发生明显变化时向群内推送消息:
+- 服务器上线/离线,连续多次查询失败才算离线,偶尔一次失败不会推送离线再上线
+- 版本变化
+- 在线人数与上一次通知时相比变化达到阈值,缓慢的变化累积到阈值同样会推送
+轮询结果同时写入状态缓存,轮询间隔内的 /motd 可以直接使用最新快照
+
+开启轮询的群及其间隔在 config.py 中配置:MCMOTD_POLL_GROUPS
+"""
+
+import asyncio
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+from nonebot import get_bot, get_plugin_config
+from nonebot.log import logger
+
+from ..config import Config
+from ..utils.motd import refresh_java_server
+from .quickquery import get_quick_query_manager
+from .history import get_history_store
+
+config = get_plugin_config(Config)
+
+# 轮询间隔下限(秒),避免配置过小时频繁探测目标服务器
+MIN_POLL_INTERVAL = 30
+
+
+def describe_changes(previous: Optional[Dict[str, Any]], current: Dict[str, Any], player_delta: int, offline_after: int = 1) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    比较上一次通知时的状态和本次查询结果,返回新的通知状态和需要通知的变化描述
+
+    Args:
+        previous: 上一次通知时的状态(online、version、players_online、failures),首次轮询时为 None
+        current: 本次的查询结果
+        player_delta: 在线人数与上一次通知时相比变化达到此值时通知
+        offline_after: 连续失败达到此次数才通知离线
+
+    Returns:
+        (新的通知状态, 变化描述列表),没有明显变化时列表为空
+    """
+    is_online = not current.get("error")
+
+    if previous is None:
+        return {
+            "online": is_online,
+            "version": current.get("version") if is_online else None,
+            "players_online": current.get("players_online") if is_online else None,
+            "failures": 0
+        }, []
+
+    state = dict(previous)
+    if not is_online:
+        state["failures"] = previous["failures"] + 1
+        if previous["online"] and state["failures"] >= offline_after:
+            state["online"] = False
+            return state, [f"服务器已离线: {current['error']}"]
+        return state, []
+
+    state["failures"] = 0
+    if not previous["online"]:
+        state.update(online=True, version=current["version"], players_online=current["players_online"])
+        return state, [f"服务器已上线, 在线人数: {current['players_online']}/{current['players_max']}"]
+
+    changes = []
+    if current["version"] != previous["version"]:
+        changes.append(f"版本变化: {previous['version']} -> {current['version']}")
+        state["version"] = current["version"]
+    if abs(current["players_online"] - previous["players_online"]) >= player_delta:
+        changes.append(f"在线人数变化: {previous['players_online']} -> {current['players_online']}")
+        state["players_online"] = current["players_online"]
+    return state, changes
+
+
+class StatusPoller:
+    """后台状态轮询器"""
+
+    def __init__(self, group_intervals: Dict[str, int], jitter: float, player_delta: int, snapshot_ttl: int, offline_after: int = 1):
+        """
+        初始化状态轮询器
+
+        Args:
+            group_intervals: 群号到轮询间隔(秒)的映射
+            jitter: 间隔随机抖动比例,避免所有群同时轮询
+            player_delta: 在线人数变化达到此值时通知
+            snapshot_ttl: 轮询结果在状态缓存中的有效期(秒)
+            offline_after: 连续失败达到此次数才通知离线
+        """
+        self.group_intervals = {
+            str(group_id): max(int(interval), MIN_POLL_INTERVAL)
+            for group_id, interval in group_intervals.items()
+        }
+        self.jitter = jitter
+        self.player_delta = player_delta
+        self.snapshot_ttl = snapshot_ttl
+        self.offline_after = offline_after
+        # (群号, 地址) 到上一次通知时状态的映射
+        self.snapshots: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def start(self):
+        """为每个开启轮询的群启动轮询任务"""
+        for group_id, interval in self.group_intervals.items():
+            if group_id not in self._tasks:
+                self._tasks[group_id] = asyncio.create_task(self._run_group(group_id, interval))
+        logger.info(f"后台状态轮询已启动,共 {len(self._tasks)} 个群")
+
+    def stop(self):
+        """停止所有轮询任务"""
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+
+    async def _run_group(self, group_id: str, interval: int):
+        # 首次轮询随机错开,避免启动时所有群同时探测
+        await asyncio.sleep(random.uniform(0, interval))
+        while True:
+            try:
+                await self.poll_group(group_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"群 {group_id} 轮询失败: {e}")
+            await asyncio.sleep(interval * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    async def poll_group(self, group_id: str):
+        """轮询一个群保存的所有服务器,并推送状态变化"""
+        servers = get_quick_query_manager().list_servers(group_id)
+        if not servers:
+            return
+
+        aliases = list(servers)
+        results = await asyncio.gather(
+            *(refresh_java_server(servers[alias], self.snapshot_ttl) for alias in aliases)
+        )
+
+        lines = []
+        for alias, result in zip(aliases, results):
+            address = servers[alias]
+            if config.MCMOTD_HISTORY_ENABLE:
+                get_history_store().record_query(address, config.MCMOTD_CLIENT_NAME or "本地", result, [])
+
+            previous = self.snapshots.get((group_id, address))
+            self.snapshots[(group_id, address)], changes = describe_changes(
+                previous, result, self.player_delta, self.offline_after
+            )
+            if changes:
+                lines.append(f"[{'default(默认)' if alias == 'default' else alias}] {address}")
+                lines.extend(changes)
+
+        # 移除已删除别名的快照
+        current = set(servers.values())
+        for key in [key for key in self.snapshots if key[0] == group_id and key[1] not in current]:
+            del self.snapshots[key]
+
+        if lines:
+            await self.notify(group_id, "服务器状态变化:\n" + "\n".join(lines))
+
+    async def notify(self, group_id: str, message: str):
+        """向群内推送消息"""
+        try:
+            bot = get_bot()
+            await bot.send_group_msg(group_id=int(group_id), message=message)
+        except Exception as e:
+            logger.error(f"推送群 {group_id} 状态变化失败: {e}")
+
+
+# 全局实例
+_status_poller: Optional[StatusPoller] = None
+
+
+def get_status_poller() -> StatusPoller:
+    """获取状态轮询器实例"""
+    global _status_poller
+    if _status_poller is None:
+        _status_poller = StatusPoller(
+            config.MCMOTD_POLL_GROUPS,
+            config.MCMOTD_POLL_JITTER,
+            config.MCMOTD_POLL_PLAYER_DELTA,
+            config.MCMOTD_POLL_SNAPSHOT_TTL,
+            config.MCMOTD_POLL_OFFLINE_AFTER
+        )
+    return _status_poller
@@ -0,0 +1,210 @@
+"""
+Java 版 Query 协议(GameSpy4)查询模块
+服务器在 server.properties 中开启 enable-query 后,可以通过 UDP 一次取得完整的玩家列表、地图和插件信息
+Server List Ping 只会返回最多 12 个玩家的样本
+
+所有查询共用一个 UDP 端点(IPv4 和 IPv6 各一个),按会话 ID 区分同时进行的查询,不再为每次探测创建套接字
+流程:
+    握手: FE FD 09 <会话ID> -> 09 <会话ID> <挑战令牌>\\0
+    完整状态: FE FD 00 <会话ID> <挑战令牌> 00000000 -> 00 <会话ID> <键值对> <玩家列表>
+挑战令牌按服务器地址缓存一段时间,轮询同一服务器时可以跳过握手
+"""
+
+import asyncio
+import random
+import socket
+import struct
+import time
+from typing import Any, Dict, Optional, Tuple
+
+MAGIC = b"\xfe\xfd"
+TYPE_STAT = 0x00
+TYPE_HANDSHAKE = 0x09
+# 完整状态响应中键值对和玩家列表前的固定填充
+KV_PADDING = b"splitnum\x00\x80\x00"
+PLAYERS_PADDING = b"\x01player_\x00\x00"
+# 服务器只认会话 ID 每个字节的低 4 位
+SESSION_MASK = 0x0F0F0F0F
+# 服务器每 30 秒更换一次挑战令牌,留出余量
+TOKEN_TTL = 25
+
+
+class QueryProtocol(asyncio.DatagramProtocol):
+    """共享 UDP 端点,按会话 ID 把响应交给等待中的查询"""
+
+    def __init__(self):
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        # 会话 ID -> (期望的响应类型, 等待响应的 Future)
+        self.pending: Dict[int, Tuple[int, asyncio.Future]] = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        if len(data) < 5:
+            return
+        packet_type = data[0]
+        session_id = struct.unpack(">i", data[1:5])[0]
+        entry = self.pending.get(session_id)
+        if entry is None or entry[0] != packet_type or entry[1].done():
+            return
+        entry[1].set_result(data[5:])
+
+    def error_received(self, exc):
+        # ICMP 端口不可达等错误无法对应到具体会话,由各查询的超时处理
+        pass
+
+    def connection_lost(self, exc):
+        for _, future in self.pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Query 端点已关闭"))
+        self.pending.clear()
+
+    def new_session(self) -> int:
+        while True:
+            session_id = random.getrandbits(32) & SESSION_MASK
+            if session_id not in self.pending:
+                return session_id
+
+    async def request(self, addr: Tuple[str, int], packet_type: int, session_id: int, payload: bytes, timeout: float) -> bytes:
+        """发送一个请求并等待同一会话的响应"""
+        future = asyncio.get_running_loop().create_future()
+        self.pending[session_id] = (packet_type, future)
+        try:
+            self.transport.sendto(MAGIC + struct.pack(">Bi", packet_type, session_id) + payload, addr)
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self.pending.pop(session_id, None)
+
+
+class QueryClient:
+    """Query 协议客户端,所有查询复用同一个端点"""
+
+    def __init__(self):
+        self._endpoints: Dict[int, QueryProtocol] = {}
+        self._lock = asyncio.Lock()
+        # (IP, 端口) -> (过期时间, 挑战令牌)
+        self._tokens: Dict[Tuple[str, int], Tuple[float, int]] = {}
+        # 进行中的握手,同时查询同一服务器时只握手一次
+        self._handshakes: Dict[Tuple[str, int], asyncio.Future] = {}
+
+    async def _endpoint(self, family: int) -> QueryProtocol:
+        protocol = self._endpoints.get(family)
+        if protocol is not None and protocol.transport is not None and not protocol.transport.is_closing():
+            return protocol
+
+        async with self._lock:
+            protocol = self._endpoints.get(family)
+            if protocol is None or protocol.transport is None or protocol.transport.is_closing():
+                local = ("::", 0) if family == socket.AF_INET6 else ("0.0.0.0", 0)
+                _, protocol = await asyncio.get_running_loop().create_datagram_endpoint(
+                    QueryProtocol, local_addr=local, family=family
+                )
+                self._endpoints[family] = protocol
+            return protocol
+
+    async def _token(self, protocol: QueryProtocol, addr: Tuple[str, int], timeout: float) -> int:
+        cached = self._tokens.get(addr)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+
+        handshake = self._handshakes.get(addr)
+        if handshake is None:
+            handshake = asyncio.ensure_future(self._handshake(protocol, addr, timeout))
+            self._handshakes[addr] = handshake
+        return await asyncio.shield(handshake)
+
+    async def _handshake(self, protocol: QueryProtocol, addr: Tuple[str, int], timeout: float) -> int:
+        try:
+            response = await protocol.request(addr, TYPE_HANDSHAKE, protocol.new_session(), b"", timeout)
+            token = int(response.split(b"\x00", 1)[0])
+            self._tokens[addr] = (time.monotonic() + TOKEN_TTL, token)
+            return token
+        finally:
+            self._handshakes.pop(addr, None)
+
+    async def full_stat(self, ip: str, port: int, timeout: float = 3.0) -> Dict[str, Any]:
+        """
+        查询服务器的完整状态
+
+        Args:
+            ip: 服务器 IP 地址
+            port: Query 端口,默认与游戏端口相同
+            timeout: 每次收发的超时时间(秒)
+
+        Returns:
+            包含 motd、version、map、plugins、players_online、players_max、players_list 的字典
+
+        Raises:
+            asyncio.TimeoutError: 服务器未开启 Query 或无响应
+            ValueError: 响应格式错误
+        """
+        family = socket.AF_INET6 if ":" in ip else socket.AF_INET
+        protocol = await self._endpoint(family)
+        addr = (ip, port)
+
+        token = await self._token(protocol, addr, timeout)
+        try:
+            response = await protocol.request(
+                addr, TYPE_STAT, protocol.new_session(), struct.pack(">i", token) + b"\x00" * 4, timeout
+            )
+        except asyncio.TimeoutError:
+            # 令牌可能已被服务器更换,下次重新握手
+            self._tokens.pop(addr, None)
+            raise
+        return parse_full_stat(response)
+
+    def close(self):
+        for protocol in self._endpoints.values():
+            if protocol.transport is not None:
+                protocol.transport.close()
+        self._endpoints.clear()
+        self._tokens.clear()
+        for handshake in self._handshakes.values():
+            handshake.cancel()
+        self._handshakes.clear()
+
+
+def parse_full_stat(data: bytes) -> Dict[str, Any]:
+    """解析完整状态响应(不含类型和会话 ID)"""
+    if not data.startswith(KV_PADDING):
+        raise ValueError("Query 响应格式错误")
+
+    kv_section, _, players_section = data[len(KV_PADDING):].partition(b"\x00\x00" + PLAYERS_PADDING)
+    fields = kv_section.decode("utf-8", "replace").split("\x00")
+    info = dict(zip(fields[0::2], fields[1::2]))
+    players = [name for name in players_section.decode("utf-8", "replace").split("\x00") if name]
+
+    # plugins 格式为 "服务端: 插件1; 插件2",原版服务器为空
+    server_mod, _, plugin_list = info.get("plugins", "").partition(":")
+    plugins = [plugin.strip() for plugin in plugin_list.split(";") if plugin.strip()]
+
+    return {
+        "motd": info.get("hostname", ""),
+        "version": info.get("version", ""),
+        "map": info.get("map", ""),
+        "server_mod": server_mod.strip(),
+        "plugins": plugins,
+        "players_online": int(info.get("numplayers") or 0),
+        "players_max": int(info.get("maxplayers") or 0),
+        "players_list": players
+    }
+
+
+_client: Optional[QueryClient] = None
+
+
+def get_query_client() -> QueryClient:
+    """获取共享的 Query 客户端"""
+    global _client
+    if _client is None:
+        _client = QueryClient()
+    return _client
+
+
+def shutdown():
+    """关闭共享的 UDP 端点"""
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
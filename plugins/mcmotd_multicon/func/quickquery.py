@@ -7,7 +7,9 @@ Motd 快速查询模块
     "别名1": "地址",
     "别名2": "地址"
     }
-以 json 文件形式存储在 根目录/data/quickquery.json 中
+以 SQLite 数据库(WAL 模式)存储在 根目录/data/quickquery.db 中
+每次增删只写入变动的一行,在线程中提交事务,不阻塞事件循环,崩溃时也不会损坏已有数据
+首次启动时如果数据库为空,会自动导入旧版的 根目录/data/quickquery.json
 指令为/addmotd 别名 地址
 如果为/addmotd 地址 为 default
 此时可直接通过/motd 直接查询 default 服务器状态
@@ -16,16 +18,20 @@ Motd 快速查询模块
 /delmotd 别名 删除对应别名
 /delmotd default 删除默认服务器
 指令在__main__.py中
-数据存储目录定义在 config.py 中:MCMOTD_QUICKQUERY_DATA_PATH
+数据存储路径定义在 config.py 中:MCMOTD_QUICKQUERY_DB_PATH
+旧版 JSON 文件路径定义在 config.py 中:MCMOTD_QUICKQUERY_DATA_PATH
 """
 
 from nonebot import get_plugin_config
+from nonebot.log import logger
 
 from ..config import Config
 
 config = get_plugin_config(Config)
 
+import asyncio
 import json
+import sqlite3
 from pathlib import Path
 from typing import Dict, Optional
 
@@ -33,43 +39,85 @@ from typing import Dict, Optional
 class QuickQueryManager:
     """快速查询管理器"""
     
-    def __init__(self, data_path: Optional[str] = None):
+    def __init__(self, db_path: Optional[str] = None, legacy_json_path: Optional[str] = None):
         """
         初始化快速查询管理器
         
         Args:
-            data_path: JSON 数据文件路径，如果为 None 则使用配置中的路径
+            db_path: SQLite 数据库路径，如果为 None 则使用配置中的路径
+            legacy_json_path: 旧版 JSON 数据文件路径，数据库为空时从这里导入
         """
-        if data_path is None:
-            data_path = config.MCMOTD_QUICKQUERY_DATA_PATH
-        self.data_path = Path(data_path)
+        if db_path is None:
+            db_path = config.MCMOTD_QUICKQUERY_DB_PATH
+        if legacy_json_path is None:
+            legacy_json_path = config.MCMOTD_QUICKQUERY_DATA_PATH
+        self.db_path = Path(db_path)
+        self.legacy_json_path = Path(legacy_json_path)
+        # 读取走内存,写入时同步更新
         self.data: Dict[str, Dict[str, str]] = {}
-        self._ensure_data_file()
+        self._lock = asyncio.Lock()
+        self._conn = self._connect()
+        self._import_legacy_json()
         self._load_data()
     
-    def _ensure_data_file(self):
-        """确保数据文件和目录存在"""
-        self.data_path.parent.mkdir(parents=True, exist_ok=True)
-        if not self.data_path.exists():
-            self.data_path.write_text("{}", encoding="utf-8")
+    def _connect(self) -> sqlite3.Connection:
+        """打开数据库并建表"""
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS servers ("
+            "group_id TEXT NOT NULL, alias TEXT NOT NULL, address TEXT NOT NULL, "
+            "PRIMARY KEY (group_id, alias))"
+        )
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        conn.commit()
+        return conn
+    
+    def _import_legacy_json(self):
+        """数据库为空且未导入过时,导入旧版 JSON 文件"""
+        if self._conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_json_imported'").fetchone():
+            return
+        
+        legacy = {}
+        if self.legacy_json_path.exists():
+            try:
+                with open(self.legacy_json_path, "r", encoding="utf-8") as f:
+                    legacy = json.load(f)
+            except Exception as e:
+                logger.error(f"读取旧版快速查询数据失败: {e}")
+                return
+        
+        rows = [
+            (str(group_id), alias, address)
+            for group_id, servers in legacy.items()
+            for alias, address in servers.items()
+        ]
+        with self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO servers (group_id, alias, address) VALUES (?, ?, ?)", rows)
+            self._conn.execute("INSERT INTO meta (key, value) VALUES ('legacy_json_imported', '1')")
+        if rows:
+            logger.info(f"已从 {self.legacy_json_path} 导入 {len(rows)} 条快速查询记录")
     
     def _load_data(self):
-        """从文件加载数据"""
-        try:
-            with open(self.data_path, "r", encoding="utf-8") as f:
-                self.data = json.load(f)
-        except Exception:
-            self.data = {}
+        """从数据库加载数据"""
+        self.data = {}
+        for group_id, alias, address in self._conn.execute("SELECT group_id, alias, address FROM servers"):
+            self.data.setdefault(group_id, {})[alias] = address
     
-    def _save_data(self):
-        """保存数据到文件"""
+    async def _execute(self, sql: str, params: tuple):
+        """在线程中执行一条写入语句并提交"""
+        def run():
+            with self._conn:
+                self._conn.execute(sql, params)
+        
         try:
-            with open(self.data_path, "w", encoding="utf-8") as f:
-                json.dump(self.data, f, ensure_ascii=False, indent=2)
+            await asyncio.to_thread(run)
         except Exception as e:
             raise Exception(f"保存数据失败: {e}")
     
-    def add_server(self, group_id: str, alias: str, address: str) -> str:
+    async def add_server(self, group_id: str, alias: str, address: str) -> str:
         """
         添加服务器地址
         
@@ -83,11 +131,12 @@ class QuickQueryManager:
         """
         group_id = str(group_id)
         
-        if group_id not in self.data:
-            self.data[group_id] = {}
-        
-        self.data[group_id][alias] = address
-        self._save_data()
+        async with self._lock:
+            await self._execute(
+                "INSERT OR REPLACE INTO servers (group_id, alias, address) VALUES (?, ?, ?)",
+                (group_id, alias, address)
+            )
+            self.data.setdefault(group_id, {})[alias] = address
         
         if alias == "default":
             return f"已设置默认服务器: {address}"
@@ -123,9 +172,9 @@ class QuickQueryManager:
             别名到地址的字典
         """
         group_id = str(group_id)
-        return self.data.get(group_id, {})
+        return dict(self.data.get(group_id, {}))
     
-    def delete_server(self, group_id: str, alias: str) -> str:
+    async def delete_server(self, group_id: str, alias: str) -> str:
         """
         删除服务器别名
         
@@ -138,20 +187,22 @@ class QuickQueryManager:
         """
         group_id = str(group_id)
         
-        if group_id not in self.data:
-            return "本群还没有添加任何服务器"
-        
-        if alias not in self.data[group_id]:
-            return f"别名 '{alias}' 不存在"
-        
-        address = self.data[group_id][alias]
-        del self.data[group_id][alias]
-        
-        # 如果群组没有服务器了,删除整个群组记录
-        if not self.data[group_id]:
-            del self.data[group_id]
-        
-        self._save_data()
+        async with self._lock:
+            if group_id not in self.data:
+                return "本群还没有添加任何服务器"
+            
+            if alias not in self.data[group_id]:
+                return f"别名 '{alias}' 不存在"
+            
+            await self._execute(
+                "DELETE FROM servers WHERE group_id = ? AND alias = ?",
+                (group_id, alias)
+            )
+            address = self.data[group_id].pop(alias)
+            
+            # 如果群组没有服务器了,删除整个群组记录
+            if not self.data[group_id]:
+                del self.data[group_id]
         
         if alias == "default":
             return f"已删除默认服务器: {address}"
@@ -0,0 +1,45 @@
+"""
+限流模块
+令牌桶按固定速率补充令牌,桶满时多余的令牌丢弃,允许不超过桶容量的突发
+"""
+
+import asyncio
+import time
+
+
+class TokenBucket:
+    """令牌桶"""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: 每秒补充的令牌数
+            capacity: 桶容量,即允许的最大突发数量
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """令牌足够时取出并返回 True,否则不等待直接返回 False"""
+        self._refill()
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    def retry_after(self, tokens: float = 1) -> float:
+        """距离令牌足够还需要等待的时间(秒)"""
+        self._refill()
+        return max(0.0, (tokens - self.tokens) / self.rate)
+
+    async def acquire(self, tokens: float = 1):
+        """等待直到取出令牌"""
+        while not self.try_acquire(tokens):
+            await asyncio.sleep(self.retry_after(tokens))
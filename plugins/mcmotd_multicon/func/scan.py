@@ -0,0 +1,136 @@
+"""
+端口扫描模块
+对同一主机的一段端口并发探测,找出其中正在运行的 Minecraft 服务器
+地址只解析一次,所有探测直接连接解析出的 IP
+
+- Java 版: 每个端口一次 Server List Ping,TCP 连接无法复用,用并发上限限制同时打开的连接数
+- Bedrock 版: 所有端口的 RakNet 未连接 Ping 从同一个 UDP 套接字发出,按 Pong 的来源端口区分
+
+探测按令牌桶限速发出,端口数不超过速率时总耗时约为一次探测超时
+"""
+
+import asyncio
+import random
+import struct
+import time
+from typing import Any, Dict, List, Optional
+
+from mcstatus import JavaServer
+
+from .latency import RAKNET_MAGIC, UNCONNECTED_PING, UNCONNECTED_PONG
+from .ratelimit import TokenBucket
+
+
+async def scan_java_ports(ip: str, ports: List[int], bucket: TokenBucket, concurrency: int, timeout: float) -> List[Dict[str, Any]]:
+    """
+    探测 Java 版服务器端口
+
+    Args:
+        ip: 服务器 IP 地址
+        ports: 要探测的端口
+        bucket: 限速令牌桶,每个探测取一个令牌
+        concurrency: 同时进行的探测数量上限
+        timeout: 单个端口的超时时间(秒)
+
+    Returns:
+        按端口排序的有响应的端口,每项包含 port、motd、version、players_online、players_max、latency
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def probe(port: int) -> Optional[Dict[str, Any]]:
+        await bucket.acquire()
+        async with semaphore:
+            try:
+                status = await asyncio.wait_for(JavaServer(ip, port, timeout=timeout).async_status(), timeout)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                return None
+
+        motd = status.description
+        return {
+            "port": port,
+            "motd": motd.get("text", str(motd)) if isinstance(motd, dict) else str(motd),
+            "version": status.version.name,
+            "players_online": status.players.online,
+            "players_max": status.players.max,
+            "latency": status.latency
+        }
+
+    results = await asyncio.gather(*(probe(port) for port in ports))
+    return [result for result in results if result is not None]
+
+
+class _BedrockScanProtocol(asyncio.DatagramProtocol):
+    """在一个 UDP 套接字上向多个端口发出未连接 Ping,按 Pong 的来源端口记录结果"""
+
+    def __init__(self, ip: str, ports: List[int]):
+        self.ip = ip
+        self.remaining = set(ports)
+        self.transport: Optional[asyncio.DatagramTransport] = None
+        # 端口 -> 发出时间
+        self.sent: Dict[int, float] = {}
+        self.results: Dict[int, Dict[str, Any]] = {}
+        self.done: Optional[asyncio.Future] = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        port = addr[1]
+        sent_at = self.sent.get(port)
+        if sent_at is None or port in self.results or len(data) < 35 or data[0] != UNCONNECTED_PONG:
+            return
+        try:
+            # 0x1c + 时间戳(8) + 服务器 GUID(8) + MAGIC(16) + 长度(2) + 广播数据
+            length = struct.unpack(">H", data[33:35])[0]
+            fields = data[35:35 + length].decode("utf-8", "replace").split(";")
+            self.results[port] = {
+                "port": port,
+                "motd": fields[1],
+                "version": fields[3],
+                "players_online": int(fields[4]),
+                "players_max": int(fields[5]),
+                "latency": (time.perf_counter() - sent_at) * 1000
+            }
+        except (IndexError, ValueError, struct.error):
+            return
+        if len(self.results) == len(self.remaining) and self.done is not None and not self.done.done():
+            self.done.set_result(None)
+
+    def error_received(self, exc):
+        # 未开放的端口会返回 ICMP 端口不可达,忽略即可
+        pass
+
+    def send(self, port: int):
+        packet = (
+            bytes([UNCONNECTED_PING]) + struct.pack(">q", int(time.time() * 1000)) + RAKNET_MAGIC
+            + struct.pack(">q", random.getrandbits(63))
+        )
+        self.sent[port] = time.perf_counter()
+        self.transport.sendto(packet, (self.ip, port))
+
+
+async def scan_bedrock_ports(ip: str, ports: List[int], bucket: TokenBucket, timeout: float) -> List[Dict[str, Any]]:
+    """
+    探测 Bedrock 版服务器端口,参数和返回值与 scan_java_ports 相同
+    所有 Ping 共用一个套接字,不需要并发上限
+    """
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: _BedrockScanProtocol(ip, ports),
+        local_addr=("::" if ":" in ip else "0.0.0.0", 0)
+    )
+    protocol.done = loop.create_future()
+    try:
+        for port in ports:
+            await bucket.acquire()
+            protocol.send(port)
+        try:
+            await asyncio.wait_for(asyncio.shield(protocol.done), timeout)
+        except asyncio.TimeoutError:
+            pass
+    finally:
+        transport.close()
+
+    return [protocol.results[port] for port in sorted(protocol.results)]
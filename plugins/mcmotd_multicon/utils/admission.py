@@ -0,0 +1,59 @@
+"""
+查询准入控制模块
+按配置创建群和用户的限流器以及全局查询队列,完整代码在 func/admission.py 中
+超级用户不受限流影响,但同样需要排队
+"""
+
+import math
+from typing import Optional
+
+from nonebot import get_driver, get_plugin_config
+from nonebot.adapters.onebot.v11 import MessageEvent
+
+from ..config import Config
+from ..func import metrics
+from ..func.admission import AdmissionQueue, KeyedRateLimiter
+
+config = get_plugin_config(Config)
+
+group_limiter = KeyedRateLimiter(config.MCMOTD_GROUP_RATE_LIMIT, config.MCMOTD_GROUP_RATE_BURST)
+user_limiter = KeyedRateLimiter(config.MCMOTD_USER_RATE_LIMIT, config.MCMOTD_USER_RATE_BURST)
+
+_admission_queue: Optional[AdmissionQueue] = None
+
+
+def get_admission_queue() -> AdmissionQueue:
+    """获取全局查询队列,首次使用时创建"""
+    global _admission_queue
+    if _admission_queue is None:
+        _admission_queue = AdmissionQueue(config.MCMOTD_QUERY_CONCURRENCY, config.MCMOTD_QUERY_QUEUE_SIZE)
+        metrics.queries_active.set_function(lambda: _admission_queue.active)
+        metrics.queries_queued.set_function(lambda: _admission_queue.queued)
+    return _admission_queue
+
+
+def check_rate_limit(event: MessageEvent) -> Optional[str]:
+    """
+    检查发起命令的群和用户是否超出速率,未超出时返回 None,否则返回提示信息
+
+    先检查两个令牌桶,都有令牌时才各取出一个,被其中一个拒绝的命令不会消耗另一个的令牌
+    """
+    user_id = str(event.user_id)
+    if user_id in get_driver().config.superusers:
+        return None
+
+    retry_after = user_limiter.peek(user_id)
+    if retry_after is not None:
+        metrics.queries_rejected.inc(reason="user")
+        return f"查询过于频繁,请 {math.ceil(retry_after)} 秒后再试"
+
+    group_id = getattr(event, "group_id", None)
+    if group_id is not None:
+        retry_after = group_limiter.peek(str(group_id))
+        if retry_after is not None:
+            metrics.queries_rejected.inc(reason="group")
+            return f"本群查询过于频繁,请 {math.ceil(retry_after)} 秒后再试"
+        group_limiter.take(str(group_id))
+
+    user_limiter.take(user_id)
+    return None
@@ -0,0 +1,141 @@
+"""
+状态卡片模块
+开启 MCMOTD_CARD_ENABLE 后,/motd 和 /motdpe 的结果渲染为一张图片发送
+完整绘制代码在 func/card.py 中,在线程池中执行,绘制再慢也不会阻塞机器人
+不使用进程池: spawn/forkserver 启动的子进程反序列化渲染函数时会导入插件包,而子进程中没有初始化 NoneBot;
+fork 则会复制已经运行着 uvicorn 和其他线程的进程
+未安装 Pillow 或渲染失败时回退到文本格式
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from nonebot import get_plugin_config
+from nonebot.adapters.onebot.v11 import Message, MessageSegment
+from nonebot.log import logger
+
+from ..config import Config
+from ..func import card
+from ..func.icon import icon_hash
+from .colorcodes import parse_color_codes
+from .format import DEFAULT_ICON_PATH, format_java_status_with_config, format_bedrock_status_with_config
+from .specialinfo import get_special_info
+
+config = get_plugin_config(Config)
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """获取渲染线程池,首次使用时创建"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=config.MCMOTD_CARD_WORKERS, thread_name_prefix="mcmotd-card")
+    return _executor
+
+
+def shutdown():
+    """关闭渲染线程池"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _latency_text(result: Dict[str, Any]) -> str:
+    latency = result.get("latency")
+    if latency is None:
+        return "超时"
+    exp_mark = "(EXP)" if config.MCMOTD_SHOW_EXPERIMENTAL_MARK and result.get("is_experimental_latency") else ""
+    stats = result.get("latency_stats")
+    if stats and stats.get("avg") is not None:
+        return f"{latency:.2f} ms{exp_mark}  p95 {stats['p95']:.2f}  ±{stats['jitter']:.2f}  丢包 {stats['loss']:.0%}"
+    return f"{latency:.2f} ms{exp_mark}"
+
+
+def _node_rows(local_result: Dict[str, Any], remote_results: List[Dict[str, Any]], local_name: str) -> list:
+    nodes = [(local_name, _latency_text(local_result), local_result.get("latency"), False)]
+    for remote in remote_results:
+        if remote.get("success"):
+            data = remote["data"]
+            nodes.append((remote["name"], _latency_text(data), data.get("latency"), False))
+        elif remote.get("pending"):
+            nodes.append((remote["name"], "等待中", None, True))
+        else:
+            nodes.append((remote["name"], "查询失败", None, False))
+    return nodes
+
+
+async def render_card(content: Dict[str, Any]) -> Optional[bytes]:
+    """在线程池中渲染卡片,未安装 Pillow 或渲染失败时返回 None"""
+    if not card.available():
+        logger.warning("未安装 Pillow,无法渲染状态卡片,使用文本格式")
+        return None
+
+    content = {**content, "font_path": config.MCMOTD_CARD_FONT_PATH, "default_icon": str(DEFAULT_ICON_PATH)}
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_executor(), card.render_status_card, content)
+    except Exception as e:
+        logger.error(f"渲染状态卡片失败: {type(e).__name__}: {e}")
+        return None
+
+
+def _card_message(image: bytes, local_result: Dict[str, Any], remote_results: List[Dict[str, Any]], show_special: bool) -> Message:
+    msg = Message(MessageSegment.image(image))
+    special_info = get_special_info(local_result, remote_results, show_special)
+    if special_info:
+        msg += MessageSegment.text(special_info)
+    return msg
+
+
+async def format_java_status_card(local_result: Dict[str, Any], remote_results: List[Dict[str, Any]], local_name: str, address: str, show_special: bool) -> Message:
+    """将 Java 服务器状态渲染为卡片,失败时回退到文本格式"""
+    if not local_result.get("error"):
+        rows = [
+            ("地址", address),
+            ("版本", local_result["version"]),
+            ("在线人数", f"{local_result['players_online']}/{local_result['players_max']}")
+        ]
+        if local_result.get("map"):
+            rows.append(("地图名称", local_result["map"]))
+        if local_result.get("plugins"):
+            rows.append(("插件", ", ".join(local_result["plugins"])))
+        if local_result.get("players_list"):
+            rows.append(("玩家列表", ", ".join(local_result["players_list"])))
+
+        icon = local_result.get("icon")
+        image = await render_card({
+            "icon": icon,
+            "icon_hash": local_result.get("icon_hash") or icon_hash(icon),
+            "motd": parse_color_codes(local_result.get("motd", "无描述")),
+            "rows": rows,
+            "nodes": _node_rows(local_result, remote_results, local_name)
+        })
+        if image is not None:
+            return _card_message(image, local_result, remote_results, show_special)
+
+    return format_java_status_with_config(local_result, remote_results, local_name, address, show_special)
+
+
+async def format_bedrock_status_card(local_result: Dict[str, Any], remote_results: List[Dict[str, Any]], local_name: str, address: str, show_special: bool) -> Message:
+    """将 Bedrock 服务器状态渲染为卡片,失败时回退到文本格式"""
+    if not local_result.get("error"):
+        image = await render_card({
+            "icon": None,
+            "icon_hash": None,
+            "motd": parse_color_codes(local_result.get("motd", "无描述")),
+            "rows": [
+                ("地址", address),
+                ("版本", local_result["version"]),
+                ("在线人数", f"{local_result['players_online']}/{local_result['players_max']}"),
+                ("地图名称", local_result["map_name"]),
+                ("游戏模式", local_result["game_mode"])
+            ],
+            "nodes": _node_rows(local_result, remote_results, local_name)
+        })
+        if image is not None:
+            return _card_message(image, local_result, remote_results, show_special)
+
+    return format_bedrock_status_with_config(local_result, remote_results, local_name, address, show_special)
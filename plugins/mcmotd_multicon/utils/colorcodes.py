@@ -11,4 +11,61 @@ def remove_color_codes(text: str) -> str:
     text = re.sub(r'§[0-9a-fk-or]', '', text)
     # 清理多余的空白
     text = '\n'.join(line.strip() for line in text.split('\n'))
-    return text.strip()
\ No newline at end of file
+    return text.strip()
+
+# 颜色代码对应的 RGB 颜色
+COLOR_CODES = {
+    "0": (0, 0, 0), "1": (0, 0, 170), "2": (0, 170, 0), "3": (0, 170, 170),
+    "4": (170, 0, 0), "5": (170, 0, 170), "6": (255, 170, 0), "7": (170, 170, 170),
+    "8": (85, 85, 85), "9": (85, 85, 255), "a": (85, 255, 85), "b": (85, 255, 255),
+    "c": (255, 85, 85), "d": (255, 85, 255), "e": (255, 255, 85), "f": (255, 255, 255)
+}
+
+# §x§r§r§g§g§b§b 形式的十六进制颜色,或单个格式代码
+_CODE_PATTERN = re.compile(r'§[xX]((?:§[0-9a-fA-F]){6})|§([0-9a-fk-orA-FK-OR])')
+
+def parse_color_codes(text: str, default: tuple = (255, 255, 255)) -> list:
+    """
+    按颜色代码拆分 MOTD
+
+    Returns:
+        每行一个片段列表,片段为 (文本, RGB 颜色, 是否粗体),首尾空行和每行首尾空白会被去掉
+    """
+    lines = []
+    color, bold = default, False
+    for raw_line in str(text or "").split('\n'):
+        segments = []
+        position = 0
+        for match in _CODE_PATTERN.finditer(raw_line):
+            if match.start() > position:
+                segments.append((raw_line[position:match.start()], color, bold))
+            position = match.end()
+            
+            if match.group(1):
+                digits = match.group(1)[1::2]
+                color = tuple(int(digits[i:i + 2], 16) for i in (0, 2, 4))
+                bold = False
+                continue
+            
+            code = match.group(2).lower()
+            if code in COLOR_CODES:
+                # 颜色代码会同时清除粗体等格式
+                color, bold = COLOR_CODES[code], False
+            elif code == "l":
+                bold = True
+            elif code == "r":
+                color, bold = default, False
+        if position < len(raw_line):
+            segments.append((raw_line[position:], color, bold))
+        
+        # 去掉行首尾的空白
+        if segments:
+            segments[0] = (segments[0][0].lstrip(),) + segments[0][1:]
+            segments[-1] = (segments[-1][0].rstrip(),) + segments[-1][1:]
+        lines.append([segment for segment in segments if segment[0]])
+    
+    while lines and not lines[0]:
+        lines.pop(0)
+    while lines and not lines[-1]:
+        lines.pop()
+    return lines
@@ -23,6 +23,10 @@ f"版本:{version}" - 服务器版本
 f"\n"
 f"在线人数:{players_online}/{players_max}" - 在线玩家数/最大玩家数
 f"\n"
+f"地图名称:{map}" - 仅在服务器开启 Query 且 MCMOTD_JAVA_QUERY 启用时显示
+f"\n"
+f"插件:{plugins}" - 同上,原版服务器没有插件时不显示
+f"\n"
 f"玩家列表:{player_list}" - 在线玩家列表 (逗号分隔)
 f"\n"
 f"========================\n"
@@ -32,6 +36,7 @@ f"{MCMOTD_CLIENT_NAME}: {latency} ms(EXP)" - 本服延迟（启用实验性延
 f"\n"
 f"{server_name}: {server_latency} ms" - 其他节点延迟,有多个节点则顺位多行显示
 f"{server_name}: {server_latency} ms(EXP)" - 其他节点延迟（启用实验性延迟检测时）
+f"{name}: {avg} ms (最低 {min} / p95 {p95} / 抖动 {jitter} / 丢包 {loss}%)" - MCMOTD_LATENCY_SAMPLES 大于 1 时各节点延迟为多次采样的平均值
 f"\n"
 
 Bedrock状态格式:
@@ -56,11 +61,30 @@ f"{MCMOTD_CLIENT_NAME}: {latency} ms(EXP)" - 本服延迟（启用实验性延
 f"\n"
 f"{server_name}: {server_latency} ms" - 其他节点延迟,有多个节点则顺位多行显示
 f"{server_name}: {server_latency} ms(EXP)" - 其他节点延迟（启用实验性延迟检测时）
+f"{name}: {avg} ms (最低 {min} / p95 {p95} / 抖动 {jitter} / 丢包 {loss}%)" - MCMOTD_LATENCY_SAMPLES 大于 1 时各节点延迟为多次采样的平均值
+f"\n"
+
+批量状态格式(/motdall):
+f"本群服务器状态总览:"
+f"========================\n"
+f"[{alias}] {address}" - 别名和地址,每个服务器一段
+f"\n"
+f"{version} | 在线 {players_online}/{players_max}" - 查询失败时显示失败原因
+f"\n"
+f"延迟: {MCMOTD_CLIENT_NAME} {latency} ms | {server_name} {server_latency} ms" - 各节点延迟写在同一行
+f"\n"
+
+端口扫描格式(/motdscan):
+f"端口扫描 {host} ({ip}) {start}-{end}"
 f"\n"
+f"{port} | {version} | {players_online}/{players_max} | {latency} ms" - 每个有响应的端口一行
+f"\n"
+f"共 {count} 个端口,{responsive} 个有响应,耗时 {elapsed} 秒"
 """
 
 import base64
-from typing import Dict, Any, List
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
 from pathlib import Path
 from nonebot import get_plugin_config
 from nonebot.adapters.onebot.v11 import Message, MessageSegment
@@ -68,21 +92,64 @@ from nonebot.adapters.onebot.v11 import Message, MessageSegment
 from .colorcodes import remove_color_codes
 from .specialinfo import get_special_info
 from ..config import Config
+from ..func.icon import IconFileCache
 
 config = get_plugin_config(Config)
 
+DEFAULT_ICON_PATH = Path(__file__).parent.parent / "res" / "default.png"
+
+_icon_cache: Optional[IconFileCache] = None
+
+
+def get_icon_cache() -> IconFileCache:
+    """获取图标文件缓存"""
+    global _icon_cache
+    if _icon_cache is None:
+        _icon_cache = IconFileCache(config.MCMOTD_ICON_CACHE_DIR, config.MCMOTD_ICON_CACHE_SIZE)
+    return _icon_cache
+
+
+@lru_cache(maxsize=1)
 def get_default_icon() -> str:
-    """获取默认图标的 base64 编码"""
+    """获取默认图标的 base64 编码,只读取一次"""
     try:
-        icon_path = Path(__file__).parent.parent / "res" / "default.png"
-        if icon_path.exists():
-            with open(icon_path, "rb") as f:
-                icon_data = base64.b64encode(f.read()).decode()
-                return icon_data
+        if DEFAULT_ICON_PATH.exists():
+            return base64.b64encode(DEFAULT_ICON_PATH.read_bytes()).decode()
     except Exception:
         pass
     return ""
 
+
+def icon_segment(icon: Optional[str], digest: Optional[str] = None) -> Optional[MessageSegment]:
+    """
+    生成图标消息段,没有服务器图标时使用默认图标
+    开启 MCMOTD_ICON_SEND_FILE 时发送本地文件路径,否则内嵌 base64
+    """
+    if config.MCMOTD_ICON_SEND_FILE:
+        if not icon:
+            return MessageSegment.image(DEFAULT_ICON_PATH.resolve()) if DEFAULT_ICON_PATH.exists() else None
+        try:
+            return MessageSegment.image(get_icon_cache().get_path(icon, digest))
+        except Exception:
+            # 图标写入失败时退回内嵌方式
+            pass
+
+    if icon:
+        return MessageSegment.image(f"base64://{icon.split(',', 1)[1] if icon.startswith('data:') else icon}")
+    default_icon = get_default_icon()
+    if default_icon:
+        return MessageSegment.image(f"base64://{default_icon}")
+    return None
+
+def format_latency_stats(result: Dict[str, Any]) -> str:
+    """多次采样的延迟统计,单次采样的结果没有统计时返回空字符串"""
+    stats = result.get("latency_stats")
+    if not stats:
+        return ""
+    if stats.get("avg") is None:
+        return " (丢包 100%)"
+    return f" (最低 {stats['min']:.2f} / p95 {stats['p95']:.2f} / 抖动 {stats['jitter']:.2f} / 丢包 {stats['loss']:.0%})"
+
 def format_java_status(local_result: Dict[str, Any], remote_results: List[Dict[str, Any]], local_name: str, address: str = "") -> Message:
     """格式化 Java 服务器状态为消息文本"""
     msg = Message()
@@ -93,14 +160,9 @@ def format_java_status(local_result: Dict[str, Any], remote_results: List[Dict[s
         return msg
     
     # 服务器图标处理
-    icon = local_result.get("icon")
+    icon = icon_segment(local_result.get("icon"), local_result.get("icon_hash"))
     if icon:
-        icon_data = icon.replace('data:image/png;base64,', '')
-        msg += MessageSegment.image(f"base64://{icon_data}")
-    else:
-        default_icon = get_default_icon()
-        if default_icon:
-            msg += MessageSegment.image(f"base64://{default_icon}")
+        msg += icon
     
     lines = []
     
@@ -114,6 +176,11 @@ def format_java_status(local_result: Dict[str, Any], remote_results: List[Dict[s
     lines.append(f"地址: {address}")
     lines.append(f"版本: {local_result['version']}")
     lines.append(f"在线人数: {local_result['players_online']}/{local_result['players_max']}")
+    # Query 协议提供的地图和插件
+    if local_result.get("map"):
+        lines.append(f"地图名称: {local_result['map']}")
+    if local_result.get("plugins"):
+        lines.append(f"插件: {', '.join(local_result['plugins'])}")
     # 玩家列表
     if local_result.get("players_list"):
         players = ", ".join(local_result["players_list"])
@@ -124,7 +191,7 @@ def format_java_status(local_result: Dict[str, Any], remote_results: List[Dict[s
     is_exp = local_result.get('is_experimental_latency', False)
     latency_str = f"{latency:.2f} ms" if latency is not None else "超时"
     exp_mark = "(EXP)" if (config.MCMOTD_SHOW_EXPERIMENTAL_MARK and is_exp and latency is not None) else ""
-    lines.append(f"{local_name}: {latency_str}{exp_mark}")
+    lines.append(f"{local_name}: {latency_str}{exp_mark}{format_latency_stats(local_result)}")
     # 远程节点延迟
     for remote in remote_results:
         if remote.get("success"):
@@ -132,9 +199,9 @@ def format_java_status(local_result: Dict[str, Any], remote_results: List[Dict[s
             remote_is_exp = remote['data'].get('is_experimental_latency', False)
             remote_latency_str = f"{remote_latency:.2f} ms" if remote_latency is not None else "超时"
             remote_exp_mark = "(EXP)" if remote_is_exp and remote_latency is not None else ""
-            lines.append(f"{remote['name']}: {remote_latency_str}{remote_exp_mark}")
+            lines.append(f"{remote['name']}: {remote_latency_str}{remote_exp_mark}{format_latency_stats(remote['data'])}")
         else:
-            lines.append(f"{remote['name']}: 查询失败")
+            lines.append(f"{remote['name']}: {'等待中' if remote.get('pending') else '查询失败'}")
     
     msg += MessageSegment.text("\n".join(lines))
     return msg
@@ -156,9 +223,9 @@ def format_bedrock_status(local_result: Dict[str, Any], remote_results: List[Dic
         return msg
     
     # 默认图标处理
-    default_icon = get_default_icon()
-    if default_icon:
-        msg += MessageSegment.image(f"base64://{default_icon}")
+    icon = icon_segment(None)
+    if icon:
+        msg += icon
     
     lines = []
     # MOTD - 清除颜色代码
@@ -178,7 +245,7 @@ def format_bedrock_status(local_result: Dict[str, Any], remote_results: List[Dic
     is_exp = local_result.get('is_experimental_latency', False)
     latency_str = f"{latency:.2f} ms" if latency is not None else "超时"
     exp_mark = "(EXP)" if (config.MCMOTD_SHOW_EXPERIMENTAL_MARK and is_exp and latency is not None) else ""
-    lines.append(f"{local_name}: {latency_str}{exp_mark}")
+    lines.append(f"{local_name}: {latency_str}{exp_mark}{format_latency_stats(local_result)}")
     # 远程节点延迟
     for remote in remote_results:
         if remote.get("success"):
@@ -186,9 +253,9 @@ def format_bedrock_status(local_result: Dict[str, Any], remote_results: List[Dic
             remote_is_exp = remote['data'].get('is_experimental_latency', False)
             remote_latency_str = f"{remote_latency:.2f} ms" if remote_latency is not None else "超时"
             remote_exp_mark = "(EXP)" if (config.MCMOTD_SHOW_EXPERIMENTAL_MARK and remote_is_exp and remote_latency is not None) else ""
-            lines.append(f"{remote['name']}: {remote_latency_str}{remote_exp_mark}")
+            lines.append(f"{remote['name']}: {remote_latency_str}{remote_exp_mark}{format_latency_stats(remote['data'])}")
         else:
-            lines.append(f"{remote['name']}: 查询失败")
+            lines.append(f"{remote['name']}: {'等待中' if remote.get('pending') else '查询失败'}")
     
     msg += MessageSegment.text("\n".join(lines))
     return msg
@@ -198,4 +265,47 @@ def format_bedrock_status_with_config(local_result: Dict[str, Any], remote_resul
     special_info = get_special_info(local_result, remote_results, show_special)
     if special_info:
         msg += MessageSegment.text("\n" + special_info)
-    return msg
\ No newline at end of file
+    return msg
+
+def _board_latency(latency: Any) -> str:
+    return f"{latency:.2f} ms" if latency is not None else "超时"
+
+def format_java_board(aliases: List[str], addresses: List[str], local_results: List[Dict[str, Any]], remote_batches: List[List[Dict[str, Any]]], local_name: str) -> Message:
+    """将多个服务器的查询结果格式化为一条状态总览消息"""
+    lines = ["本群服务器状态总览:"]
+    
+    for index, (alias, address) in enumerate(zip(aliases, addresses)):
+        local_result = local_results[index]
+        remote_results = remote_batches[index] if index < len(remote_batches) else []
+        
+        lines.append("========================")
+        lines.append(f"[{'default(默认)' if alias == 'default' else alias}] {address}")
+        
+        if local_result.get("error"):
+            lines.append(f"查询失败: {local_result['error']}")
+        else:
+            lines.append(f"{local_result['version']} | 在线 {local_result['players_online']}/{local_result['players_max']}")
+        
+        latencies = [f"{local_name} {_board_latency(local_result.get('latency'))}"]
+        for remote in remote_results:
+            if remote.get("success"):
+                latencies.append(f"{remote['name']} {_board_latency(remote['data'].get('latency'))}")
+            else:
+                latencies.append(f"{remote['name']} 查询失败")
+        lines.append("延迟: " + " | ".join(latencies))
+    
+    return Message(MessageSegment.text("\n".join(lines)))
+
+def format_scan_result(scan: Dict[str, Any]) -> Message:
+    """格式化端口扫描结果"""
+    lines = [f"端口扫描 {scan['host']} ({scan['ip']}) {scan['start']}-{scan['end']}", "========================"]
+    for result in scan["results"]:
+        lines.append(
+            f"{result['port']} | {remove_color_codes(result['version'])} | "
+            f"{result['players_online']}/{result['players_max']} | {result['latency']:.2f} ms"
+        )
+    if not scan["results"]:
+        lines.append("没有端口响应")
+    lines.append("========================")
+    lines.append(f"共 {scan['end'] - scan['start'] + 1} 个端口,{len(scan['results'])} 个有响应,耗时 {scan['elapsed']:.2f} 秒")
+    return Message(MessageSegment.text("\n".join(lines)))
@@ -4,16 +4,84 @@ Minecraft 服务器状态查询模块
 完整代码在 func/motd.py 中
 """
 
+import time
+
+from nonebot import get_plugin_config
+
+from ..config import Config
 from ..func.motd import Motd
-from .nslookup import nslookup_srv
+from ..func.cache import StatusCache, normalize_address
+from ..func import metrics
+from .nslookup import resolve_java_address, resolve_bedrock_address
+
+config = get_plugin_config(Config)
+
+# 主干节点和客户端节点共用的状态缓存
+status_cache = StatusCache(config.MCMOTD_STATUS_CACHE_TTL, config.MCMOTD_STATUS_CACHE_SIZE)
 
 # Java 查询
 async def query_java_server(address: str | int):
+    return await status_cache.get_or_fetch(
+        ("java", normalize_address(address)),
+        lambda: _query_java_server(address)
+    )
+
+# Bedrock 查询
+async def query_bedrock_server(address: str | int):
+    return await status_cache.get_or_fetch(
+        ("bedrock", normalize_address(address)),
+        lambda: _query_bedrock_server(address)
+    )
+
+# 只测量 Java 服务器延迟,缓存中有完整状态时直接使用
+async def query_java_latency(address: str | int):
+    key = normalize_address(address)
+    cached = status_cache.get(("java", key))
+    if cached is not None:
+        metrics.status_cache_requests.inc(result="hit")
+        return {**cached, "cached": True}
+    return await status_cache.get_or_fetch(
+        ("java_latency", key),
+        lambda: _query_java_latency(address)
+    )
+
+# 跳过缓存重新查询 Java 服务器,结果写入缓存
+async def refresh_java_server(address: str | int, ttl: int = None):
+    result = await _query_java_server(address)
+    if not result.get("error"):
+        status_cache.set(("java", normalize_address(address)), result, ttl)
+    return result
+
+async def _query_java_server(address: str | int):
+    started = time.perf_counter()
+    result = await _probe_java_server(address)
+    metrics.probe_duration_seconds.observe(
+        time.perf_counter() - started, edition="java", result="error" if result.get("error") else "success"
+    )
+    return result
+
+async def _query_bedrock_server(address: str | int):
+    started = time.perf_counter()
+    result = await _probe_bedrock_server(address)
+    metrics.probe_duration_seconds.observe(
+        time.perf_counter() - started, edition="bedrock", result="error" if result.get("error") else "success"
+    )
+    return result
+
+async def _query_java_latency(address: str | int):
+    started = time.perf_counter()
+    result = await _probe_java_latency(address)
+    metrics.probe_duration_seconds.observe(
+        time.perf_counter() - started, edition="java_ping", result="error" if result.get("error") else "success"
+    )
+    return result
+
+async def _probe_java_server(address: str | int):
     try:
-        # 走一遍 SRV 解析
-        address, port, srv_flag = await nslookup_srv(address)
-        motd = Motd(address)
-        result = await motd.java_status(address, port)
+        # 走一遍 SRV 和 A/AAAA 解析,结果直接传给后续查询,不再重复解析
+        host, port, ip = await resolve_java_address(address)
+        motd = Motd(host, port, ip)
+        result = await motd.java_status(host, port)
         return result
     except Exception as e:
         # 返回错误信息而不是 None
@@ -29,11 +97,23 @@ async def query_java_server(address: str | int):
             "error": str(e)
         }
 
-# Bedrock 查询
-async def query_bedrock_server(address: str | int):
+async def _probe_java_latency(address: str | int):
+    try:
+        host, port, ip = await resolve_java_address(address)
+        motd = Motd(host, port, ip)
+        return await motd.java_latency()
+    except Exception as e:
+        return {
+            "latency": None,
+            "is_experimental_latency": False,
+            "error": str(e)
+        }
+
+async def _probe_bedrock_server(address: str | int):
     try:
-        motd = Motd(address)
-        result = await motd.bedrock_status(address)
+        host, port, ip = await resolve_bedrock_address(address)
+        motd = Motd(host, port, ip)
+        result = await motd.bedrock_status(host, port)
         return result
     except Exception as e:
         # 返回错误信息而不是 None
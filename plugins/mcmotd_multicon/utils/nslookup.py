@@ -7,3 +7,11 @@ from ..func.nslookup import Nslookup
 async def nslookup_srv(address: str) -> tuple[str, int]:
     result = await Nslookup(address).nslookup_srv()
     return result
+
+async def resolve_java_address(address: str) -> tuple[str, int, str]:
+    """解析 Java 版地址,返回 (目标主机名, 端口, IP)"""
+    return await Nslookup(address).resolve_java()
+
+async def resolve_bedrock_address(address: str) -> tuple[str, int, str]:
+    """解析 Bedrock 版地址,返回 (主机名, 端口, IP)"""
+    return await Nslookup(address).resolve_bedrock()
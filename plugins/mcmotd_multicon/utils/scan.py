@@ -0,0 +1,64 @@
+"""
+端口扫描模块
+解析地址后对一段端口并发探测,完整代码在 func/scan.py 中
+所有扫描共用一个令牌桶,同时进行多个扫描时总速率也不超过 MCMOTD_SCAN_RATE
+"""
+
+import time
+from typing import Any, Dict, Tuple
+
+from nonebot import get_plugin_config
+
+from ..config import Config
+from ..func.nslookup import Nslookup
+from ..func.ratelimit import TokenBucket
+from ..func.scan import scan_java_ports, scan_bedrock_ports
+
+config = get_plugin_config(Config)
+
+scan_bucket = TokenBucket(config.MCMOTD_SCAN_RATE, config.MCMOTD_SCAN_RATE)
+
+
+def parse_port_range(text: str) -> Tuple[int, int]:
+    """解析 start-end 或单个端口,返回 (起始端口, 结束端口)"""
+    start, _, end = text.partition("-")
+    if not start.isdigit() or (end and not end.isdigit()):
+        raise ValueError(f"端口范围无效: {text}")
+    start, end = int(start), int(end or start)
+    if not 0 < start <= end < 65536:
+        raise ValueError(f"端口范围无效: {text}")
+    if end - start + 1 > config.MCMOTD_SCAN_MAX_PORTS:
+        raise ValueError(f"一次最多扫描 {config.MCMOTD_SCAN_MAX_PORTS} 个端口")
+    return start, end
+
+
+async def scan_ports(edition: str, host: str, start: int, end: int) -> Dict[str, Any]:
+    """
+    扫描主机的一段端口
+
+    Args:
+        edition: "java" 或 "bedrock"
+        host: 主机名或 IP 地址,不解析 SRV 记录
+        start: 起始端口
+        end: 结束端口(包含)
+
+    Returns:
+        包含 host、ip、start、end、results(有响应的端口)和 elapsed(耗时秒数)的字典
+    """
+    ip = await Nslookup(host).nslookup_ip()
+    ports = list(range(start, end + 1))
+
+    started = time.perf_counter()
+    if edition == "bedrock":
+        results = await scan_bedrock_ports(ip, ports, scan_bucket, config.MCMOTD_SCAN_TIMEOUT)
+    else:
+        results = await scan_java_ports(ip, ports, scan_bucket, config.MCMOTD_SCAN_CONCURRENCY, config.MCMOTD_SCAN_TIMEOUT)
+
+    return {
+        "host": host,
+        "ip": ip,
+        "start": start,
+        "end": end,
+        "results": results,
+        "elapsed": time.perf_counter() - started
+    }
@@ -12,6 +12,7 @@ f"{server_name}: {server_info}" - 其他节点名称: 该节点的 MOTD 描述
 from typing import Dict, Any, List
 from collections import defaultdict
 from .colorcodes import remove_color_codes
+from ..func.icon import icon_hash
 
 def get_special_info(local_result: Dict[str, Any], remote_results: List[Dict[str, Any]], show_special: bool) -> str:
     # 检查是否启用特殊信息显示
@@ -20,7 +21,8 @@ def get_special_info(local_result: Dict[str, Any], remote_results: List[Dict[str
     
     # 获取本地节点信息并清理颜色代码
     local_motd = remove_color_codes(local_result.get("motd", ""))
-    local_icon = local_result.get("icon")
+    # 图标按内容哈希比较,客户端可能只传回了哈希
+    local_icon = icon_hash(local_result.get("icon"))
     
     # 用于聚合相同信息的节点
     motd_groups = defaultdict(list)
@@ -34,7 +36,7 @@ def get_special_info(local_result: Dict[str, Any], remote_results: List[Dict[str
         data = remote.get("data", {})
         name = remote.get("name", "未知")
         remote_motd = remove_color_codes(data.get("motd", ""))
-        remote_icon = data.get("icon")
+        remote_icon = data.get("icon_hash") or icon_hash(data.get("icon"))
         
         # 过滤掉查询失败的情况
         if remote_motd in ["查询失败", ""]:
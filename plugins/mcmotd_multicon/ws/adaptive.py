@@ -0,0 +1,83 @@
+"""
+自适应超时模块
+主干节点按 (客户端, 查询目标) 记录响应时间的指数加权平均值和平均偏差,据此计算该客户端查询该目标的截止时间
+查询目标包括查询类型、查询档位和服务器地址,查询快速服务器或命中缓存的历史不会缩短查询其他服务器的截止时间
+缓存命中和出错的响应不计入样本,它们的耗时不代表一次真实探测需要的时间
+计算方法与 TCP 的重传超时(RFC 6298)相同:
+    平均值 += (样本 - 平均值) / 8
+    偏差 += (|样本 - 平均值| - 偏差) / 4
+    截止时间 = 平均值 + 4 * 偏差
+截止时间限制在 [MCMOTD_SERVER_TIMEOUT_MIN, MCMOTD_SERVER_STATUS_TIMEOUT] 之间
+样本不足时使用 MCMOTD_SERVER_STATUS_TIMEOUT,超时按截止时间计为一次样本,下一次会放宽截止时间
+"""
+
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+# 平均值和偏差的平滑系数
+ALPHA = 0.125
+BETA = 0.25
+# 截止时间 = 平均值 + DEVIATION_FACTOR * 偏差
+DEVIATION_FACTOR = 4
+# 样本数达到此值后才使用自适应的截止时间
+WARMUP_SAMPLES = 3
+# 最多保留的统计条目数,超出时淘汰最久未使用的
+MAX_ENTRIES = 4096
+
+
+class NodeTiming:
+    """单个客户端的响应时间统计"""
+
+    __slots__ = ("mean", "deviation", "samples")
+
+    def __init__(self):
+        self.mean: Optional[float] = None
+        self.deviation = 0.0
+        self.samples = 0
+
+    def observe(self, seconds: float):
+        if self.mean is None:
+            self.mean = seconds
+            self.deviation = seconds / 2
+        else:
+            self.deviation += BETA * (abs(seconds - self.mean) - self.deviation)
+            self.mean += ALPHA * (seconds - self.mean)
+        self.samples += 1
+
+
+class AdaptiveDeadlines:
+    """按 (客户端, 查询目标) 的历史响应时间计算截止时间"""
+
+    def __init__(self, min_timeout: float, max_timeout: float, max_entries: int = MAX_ENTRIES):
+        """
+        Args:
+            min_timeout: 截止时间下限(秒)
+            max_timeout: 截止时间上限(秒),样本不足时也使用此值
+            max_entries: 最多保留的统计条目数
+        """
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[Hashable, NodeTiming]" = OrderedDict()
+
+    def timeout_for(self, key: Hashable) -> float:
+        """获取本次查询的超时时间(秒),key 为 (客户端名称, 查询目标)"""
+        timing = self.entries.get(key)
+        if timing is None or timing.samples < WARMUP_SAMPLES:
+            return self.max_timeout
+        timeout = timing.mean + DEVIATION_FACTOR * timing.deviation
+        return min(max(timeout, self.min_timeout), self.max_timeout)
+
+    def observe(self, key: Hashable, seconds: float):
+        """记录一次响应时间"""
+        timing = self.entries.get(key)
+        if timing is None:
+            timing = self.entries[key] = NodeTiming()
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        self.entries.move_to_end(key)
+        timing.observe(seconds)
+
+    def observe_timeout(self, key: Hashable, timeout: float):
+        """记录一次超时,按截止时间计为样本"""
+        self.observe(key, timeout)
@@ -7,78 +7,416 @@ MCMOTD_Server_STATUS_TIMEOUT: int
 MCMOTD_SERVER_TOKEN: str | int = ""
 """
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from typing import Dict, List, Any
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import PlainTextResponse
+from typing import Dict, List, Any, Optional, Set, Tuple
 import asyncio
+import hmac
+import uuid
 import uvicorn
 from nonebot.log import logger
 
+from ..func.cache import normalize_address
+from ..func.icon import IconStore, icon_hash
+from ..func import metrics
+from .protocol import Codec, PROFILE_FULL, negotiate, server_answer
+from .adaptive import AdaptiveDeadlines
+
 app = FastAPI()
 
+# 索取图标后等待客户端发回的时间(秒),超过后可以再次索取
+ICON_REQUEST_TTL = 30
+
+# 本服务器支持的协议特性,在认证成功时告知客户端
+SERVER_FEATURES = ["icon_hash"]
+
 # 存储已连接的客户端
 connected_clients: Dict[str, WebSocket] = {}
-# 存储等待响应的请求
+# 各客户端协商得到的消息编码
+client_codecs: Dict[str, Codec] = {}
+# 存储等待响应的请求,键为 "请求ID:客户端名称"
 pending_requests: Dict[str, asyncio.Future] = {}
+# 各客户端在认证时声明的标签,以及标签到客户端名称的索引
+client_tags: Dict[str, Set[str]] = {}
+tag_index: Dict[str, Set[str]] = {}
+
+metrics.connected_nodes.set_function(lambda: len(connected_clients))
+metrics.pending_requests.set_function(lambda: len(pending_requests))
+
+def _pending_key(request_id: str, client_name: str) -> str:
+    """同一个查询帧会发给所有客户端,用客户端名称区分各自的响应"""
+    return f"{request_id}:{client_name}"
+
+def normalize_tag(tag: Any) -> str:
+    """规范化标签,忽略大小写和开头的 @"""
+    return str(tag).strip().lstrip("@").lower()
+
+def _index_tags(client_name: str, tags: Set[str]):
+    client_tags[client_name] = tags
+    for tag in tags:
+        tag_index.setdefault(tag, set()).add(client_name)
+
+def _unindex_tags(client_name: str):
+    for tag in client_tags.pop(client_name, set()):
+        names = tag_index.get(tag)
+        if names is not None:
+            names.discard(client_name)
+            if not names:
+                del tag_index[tag]
+
+def flatten_relayed(relay_name: str, response: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    展开中继节点返回的下游结果,名称加上中继节点前缀,如 "relay/node1"
+
+    中继节点的下游结果已经按同样的方式展开过,多级中继的名称为 "relay/sub-relay/node1"
+    """
+    entries = []
+    for entry in response.get("relayed") or []:
+        if not isinstance(entry, dict):
+            continue
+        entries.append({**entry, "name": f"{relay_name}/{entry.get('name', '未知')}"})
+    return entries
+
+def timing_target(message: Dict[str, Any]) -> Optional[tuple]:
+    """自适应超时统计使用的查询目标,批量查询的耗时与地址数量有关,没有单一目标"""
+    if not message.get("address"):
+        return None
+    return (message.get("query_type"), message.get("profile", PROFILE_FULL), normalize_address(message["address"]))
+
+def learnable(response: Dict[str, Any]) -> bool:
+    """响应是否可以计入自适应超时的样本,缓存命中和出错的响应耗时不代表一次真实探测"""
+    data = response.get("data")
+    if response.get("error") or not isinstance(data, dict):
+        return False
+    return not data.get("error") and not data.get("cached")
+
+def select_clients(tags: Optional[List[str]] = None) -> List[Tuple[str, WebSocket]]:
+    """
+    选出要下发查询的客户端
+
+    Args:
+        tags: 标签列表,客户端需带有全部标签才会被选中;为空时选出所有客户端
+
+    Returns:
+        (客户端名称, 连接) 列表
+    """
+    if not tags:
+        return list(connected_clients.items())
+    
+    names = set.intersection(*(tag_index.get(normalize_tag(tag), set()) for tag in tags))
+    return [(name, connected_clients[name]) for name in sorted(names) if name in connected_clients]
+
+async def send_frame(websocket: WebSocket, frame: str | bytes):
+    """发送已编码的帧"""
+    if isinstance(frame, bytes):
+        await websocket.send_bytes(frame)
+    else:
+        await websocket.send_text(frame)
+
+async def send_message(websocket: WebSocket, codec: Codec, message: Dict[str, Any]):
+    """按协商的编码发送消息"""
+    await send_frame(websocket, codec.encode(message))
+
+async def receive_message(websocket: WebSocket, codec: Codec) -> Dict[str, Any]:
+    """接收一条文本帧或二进制帧并解码"""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000))
+    frame = message.get("bytes")
+    if frame is None:
+        frame = message.get("text")
+    return codec.decode(frame)
 
 class WebSocketServer:
     def __init__(self, config):
         self.config = config
         self.server = None
+        # 客户端传来的图标,按内容哈希保存
+        self.icon_store = IconStore(config.MCMOTD_ICON_STORE_SIZE)
+        # 已经向客户端索取、尚未收到的图标哈希 -> 索取时间
+        # 客户端断开或没有回应时,超过 ICON_REQUEST_TTL 后重新索取
+        self.requested_icons: Dict[str, float] = {}
+        # 各客户端的自适应截止时间
+        self.deadlines = AdaptiveDeadlines(config.MCMOTD_SERVER_TIMEOUT_MIN, config.MCMOTD_SERVER_STATUS_TIMEOUT)
+        # 后台等待迟到响应的任务
+        self._background_tasks: Set[asyncio.Task] = set()
+    
+    async def resolve_icon(self, websocket: WebSocket, codec: Codec, data: Dict[str, Any]):
+        """
+        处理查询结果中的图标
+
+        新版客户端只发送图标哈希,已知的哈希直接从图标存储中补全,
+        未见过的哈希在后台向客户端索取,不阻塞本次查询;
+        旧版客户端发送完整图标,顺便计算哈希并保存
+        """
+        if not isinstance(data, dict):
+            return
+        
+        if data.get("icon"):
+            data["icon_hash"] = self.icon_store.put(data["icon"])
+            return
+        
+        digest = data.get("icon_hash")
+        if not digest:
+            return
+        
+        icon = self.icon_store.get(digest)
+        if icon is not None:
+            data["icon"] = icon
+            return
+        
+        now = asyncio.get_running_loop().time()
+        requested_at = self.requested_icons.get(digest)
+        if requested_at is None or now - requested_at > ICON_REQUEST_TTL:
+            # 顺便清理一直没有回应的索取记录
+            for stale in [key for key, at in self.requested_icons.items() if now - at > ICON_REQUEST_TTL]:
+                del self.requested_icons[stale]
+            self.requested_icons[digest] = now
+            await send_message(websocket, codec, {"type": "icon_request", "hash": digest})
+    
+    async def resolve_response_icons(self, websocket: WebSocket, codec: Codec, response: Dict[str, Any]):
+        """处理查询响应中所有结果的图标,包括批量查询的结果列表和中继节点转发的下游结果"""
+        results = [response.get("data")]
+        results.extend(entry.get("data") for entry in response.get("relayed") or [] if isinstance(entry, dict))
+        for result in results:
+            for item in (result if isinstance(result, list) else [result]):
+                await self.resolve_icon(websocket, codec, item)
+    
+    def store_icon(self, digest: str, icon: str):
+        """保存客户端发回的图标,内容与哈希不符时丢弃"""
+        self.requested_icons.pop(digest, None)
+        if icon and icon_hash(icon) == digest:
+            self.icon_store.put(icon)
+    
+    async def query_all_clients(self, query_type: str, address: str, timeout: int, tags: Optional[List[str]] = None, profile: str = PROFILE_FULL) -> List[Dict[str, Any]]:
+        """
+        向所有客户端(指定标签时只向带有这些标签的客户端)并发发送查询请求并收集结果
+
+        Args:
+            profile: 查询档位(见 protocol.py),客户端只返回档位需要的字段
+        """
+        return await self.broadcast_query(
+            {
+                "type": "query",
+                "query_type": query_type,
+                "address": address,
+                "profile": profile
+            },
+            timeout,
+            tags,
+            adaptive=self.config.MCMOTD_SERVER_ADAPTIVE_TIMEOUT,
+            quorum=self.config.MCMOTD_SERVER_QUORUM
+        )
     
-    async def query_all_clients(self, query_type: str, address: str, timeout: int) -> List[Dict[str, Any]]:
-        """向所有客户端发送查询请求并收集结果"""
+    async def query_all_clients_batch(self, query_type: str, addresses: List[str], timeout: int, profile: str = PROFILE_FULL) -> List[List[Dict[str, Any]]]:
+        """
+        在一条查询消息中向所有客户端下发多个地址
+
+        Returns:
+            与 addresses 一一对应的列表,每项为该地址在各客户端的查询结果
+        """
+        responses = await self.broadcast_query({
+            "type": "query",
+            "query_type": query_type,
+            "addresses": addresses,
+            "profile": profile
+        }, timeout)
+        
+        batches: List[List[Dict[str, Any]]] = [[] for _ in addresses]
+        for response in responses:
+            data = response.get("data")
+            if response["success"] and not (isinstance(data, list) and len(data) == len(addresses)):
+                # 旧版客户端不认识 addresses 字段
+                response = {"name": response["name"], "success": False, "error": "客户端不支持批量查询"}
+            
+            for index, batch in enumerate(batches):
+                if response["success"]:
+                    batch.append({"name": response["name"], "success": True, "data": data[index]})
+                else:
+                    batch.append(response)
+        return batches
+    
+    async def broadcast_query(self, message: Dict[str, Any], timeout: int, tags: Optional[List[str]] = None, adaptive: bool = False, quorum: int = 0) -> List[Dict[str, Any]]:
+        """
+        向所有客户端并发发送查询消息并收集结果
+
+        查询帧按编码和超时时间序列化,相同的连接复用同一帧,所有客户端同时等待,
+        总耗时取决于最慢的节点而不是节点数量
+        指定标签时通过标签索引只选出带有全部标签的客户端
+
+        Args:
+            adaptive: 为 True 时每个客户端使用按查询同一目标的历史响应时间计算的截止时间(见 adaptive.py),
+                      否则都使用 timeout;批量查询没有单一目标,总是使用 timeout
+            quorum: 大于 0 时,收到这么多个响应或第 quorum 快的截止时间已过就立即返回,
+                    其余客户端标记为等待中,并在后台继续等待到各自的截止时间以更新响应时间统计
+        """
         results = []
+        clients = select_clients(tags)
         
         logger.info(f"当前已连接客户端数量: {len(connected_clients)}")
-        logger.info(f"客户端列表: {list(connected_clients.keys())}")
+        logger.info(f"本次查询的客户端: {[name for name, _ in clients]}")
         
-        if not connected_clients:
-            logger.warning("没有客户端连接")
+        if not clients:
+            logger.warning(f"没有带有标签 {tags} 的客户端连接" if tags else "没有客户端连接")
             return results
         
-        for client_name, websocket in connected_clients.items():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        request_id = uuid.uuid4().hex
+        message = {**message, "request_id": request_id}
+        target = message.get("address") or ", ".join(message.get("addresses", []))
+        # 每种编码和超时时间的组合只序列化一次,相同的连接复用同一帧
+        frames: Dict[tuple, str | bytes] = {}
+        
+        # 各客户端的超时时间和截止时间
+        target_key = timing_target(message)
+        adaptive = adaptive and target_key is not None
+        timeouts = {
+            client_name: min(self.deadlines.timeout_for((client_name, target_key)), timeout) if adaptive else timeout
+            for client_name, _ in clients
+        }
+        deadlines = {client_name: started + seconds for client_name, seconds in timeouts.items()}
+        quorum = min(quorum, len(clients))
+        quorum_deadline = started + sorted(timeouts.values())[quorum - 1] if quorum else None
+        
+        # 先为每个客户端登记等待中的请求,避免响应先于登记到达
+        futures: Dict[str, asyncio.Future] = {}
+        for client_name, _ in clients:
+            future = loop.create_future()
+            futures[client_name] = future
+            pending_requests[_pending_key(request_id, client_name)] = future
+        
+        errors: Dict[str, str] = {}
+        # 提前返回时仍未响应的客户端
+        stragglers: Dict[str, asyncio.Future] = {}
+        
+        async def send_query(client_name: str, websocket: WebSocket):
             try:
-                request_id = f"{client_name}_{asyncio.get_event_loop().time()}"
-                future = asyncio.Future()
-                pending_requests[request_id] = future
-                
-                # 发送查询请求
-                logger.info(f"向客户端 {client_name} 发送查询请求: {query_type} {address}")
-                await websocket.send_json({
-                    "type": "query",
-                    "request_id": request_id,
-                    "query_type": query_type,
-                    "address": address
-                })
+                logger.info(f"向客户端 {client_name} 发送查询请求: {message['query_type']} {target}")
+                codec = client_codecs.get(client_name, Codec())
+                # 超时时间随查询下发,使用该客户端自己的截止时间,中继节点据此决定等待下游的时间
+                frame_key = (codec.key, timeouts[client_name])
+                if frame_key not in frames:
+                    frames[frame_key] = codec.encode({**message, "timeout": timeouts[client_name]})
+                await send_frame(websocket, frames[frame_key])
+            except Exception as e:
+                logger.error(f"查询客户端 {client_name} 失败: {e}")
+                errors[client_name] = str(e)
+                futures[client_name].cancel()
+        
+        try:
+            # 同时向所有客户端发送
+            await asyncio.gather(*(send_query(name, ws) for name, ws in clients))
+            
+            # 等待各客户端响应,每个客户端只等到自己的截止时间
+            waiting = {name: f for name, f in futures.items() if not f.done()}
+            while waiting:
+                now = loop.time()
+                if quorum:
+                    answered = sum(1 for f in futures.values() if f.done() and not f.cancelled())
+                    if answered >= quorum or now >= quorum_deadline:
+                        break
+                waiting = {name: f for name, f in waiting.items() if deadlines[name] > now}
+                if not waiting:
+                    break
                 
-                # 等待响应
-                try:
-                    response = await asyncio.wait_for(future, timeout=timeout)
+                wake_at = min(deadlines[name] for name in waiting)
+                if quorum:
+                    wake_at = min(wake_at, quorum_deadline)
+                await asyncio.wait(
+                    waiting.values(),
+                    timeout=wake_at - now,
+                    return_when=asyncio.FIRST_COMPLETED if quorum else asyncio.ALL_COMPLETED
+                )
+                waiting = {name: f for name, f in waiting.items() if not f.done()}
+            finished_at = loop.time()
+            
+            for client_name, _ in clients:
+                future = futures[client_name]
+                if client_name in errors:
+                    metrics.node_failures.inc(node=client_name, reason="error")
+                    results.append({
+                        "name": client_name,
+                        "success": False,
+                        "error": errors[client_name]
+                    })
+                elif future.done() and not future.cancelled():
                     logger.info(f"收到客户端 {client_name} 的响应")
+                    response = future.result()
+                    self.record_response(client_name, response, started, target_key if adaptive else None)
+                    if response.get("error"):
+                        metrics.node_failures.inc(node=client_name, reason="error")
+                        results.append({
+                            "name": client_name,
+                            "success": False,
+                            "error": response["error"]
+                        })
+                    else:
+                        results.append({
+                            "name": client_name,
+                            "success": True,
+                            "data": response.get("data")
+                        })
+                    results.extend(flatten_relayed(client_name, response))
+                elif quorum and deadlines[client_name] > finished_at:
+                    logger.info(f"客户端 {client_name} 尚未响应,已满足法定数,标记为等待中")
+                    stragglers[client_name] = future
                     results.append({
                         "name": client_name,
-                        "success": True,
-                        "data": response
+                        "success": False,
+                        "pending": True,
+                        "error": "等待中"
                     })
-                except asyncio.TimeoutError:
+                else:
                     logger.warning(f"客户端 {client_name} 响应超时")
+                    self.record_timeout(client_name, timeouts[client_name], target_key if adaptive else None)
                     results.append({
                         "name": client_name,
                         "success": False,
                         "error": "超时"
                     })
-                finally:
-                    pending_requests.pop(request_id, None)
-                    
-            except Exception as e:
-                logger.error(f"查询客户端 {client_name} 失败: {e}")
-                results.append({
-                    "name": client_name,
-                    "success": False,
-                    "error": str(e)
-                })
+        finally:
+            for client_name, future in futures.items():
+                if client_name not in stragglers:
+                    future.cancel()
+                    pending_requests.pop(_pending_key(request_id, client_name), None)
+            if stragglers:
+                task = asyncio.create_task(self.follow_stragglers(
+                    request_id, stragglers, started, deadlines, timeouts, target_key if adaptive else None
+                ))
+                self._background_tasks.add(task)
+                task.add_done_callback(self._background_tasks.discard)
         
         return results
+    
+    def record_response(self, client_name: str, response: Dict[str, Any], started: float, target_key: Optional[tuple]):
+        """记录客户端的响应时间,target_key 不为 None 时同时计入自适应超时统计"""
+        seconds = response["received_at"] - started
+        metrics.node_response_seconds.observe(seconds, node=client_name)
+        if target_key is not None and learnable(response):
+            self.deadlines.observe((client_name, target_key), seconds)
+    
+    def record_timeout(self, client_name: str, timeout: float, target_key: Optional[tuple]):
+        """记录客户端的一次超时,target_key 不为 None 时同时计入自适应超时统计"""
+        metrics.node_failures.inc(node=client_name, reason="timeout")
+        if target_key is not None:
+            self.deadlines.observe_timeout((client_name, target_key), timeout)
+    
+    async def follow_stragglers(self, request_id: str, stragglers: Dict[str, asyncio.Future], started: float, deadlines: Dict[str, float], timeouts: Dict[str, float], target_key: Optional[tuple]):
+        """在后台等待提前返回时仍未响应的客户端,迟到的响应只用于更新响应时间统计"""
+        loop = asyncio.get_running_loop()
+        try:
+            wait_until = max(deadlines[name] for name in stragglers)
+            await asyncio.wait(stragglers.values(), timeout=max(wait_until - loop.time(), 0))
+            for client_name, future in stragglers.items():
+                if future.done() and not future.cancelled():
+                    self.record_response(client_name, future.result(), started, target_key)
+                else:
+                    self.record_timeout(client_name, timeouts[client_name], target_key)
+        finally:
+            for client_name, future in stragglers.items():
+                future.cancel()
+                pending_requests.pop(_pending_key(request_id, client_name), None)
 
 server_instance: WebSocketServer = None
 
@@ -112,34 +450,70 @@ async def websocket_endpoint(websocket: WebSocket):
             await websocket.close(code=1008, reason="客户端已连接")
             return
         
+        # 协商后续消息的编码,旧版客户端继续使用 JSON
+        codec = negotiate(auth_data, server_instance.config.MCMOTD_WS_COMPRESS_THRESHOLD)
+        
+        # 客户端声明的标签,旧版客户端没有标签
+        tags = auth_data.get("tags")
+        tags = {normalize_tag(tag) for tag in tags if normalize_tag(tag)} if isinstance(tags, list) else set()
+        
         # 添加到已连接列表
         connected_clients[client_name] = websocket
-        logger.info(f"客户端 {client_name} 已连接")
+        client_codecs[client_name] = codec
+        _index_tags(client_name, tags)
+        logger.info(
+            f"客户端 {client_name} 已连接 (编码: {codec.encoding}, 压缩: {codec.compression or '无'}, "
+            f"标签: {', '.join(sorted(tags)) or '无'})"
+        )
         
-        # 发送认证成功消息
-        await websocket.send_json({"type": "auth_success"})
+        # 发送认证成功消息,认证阶段始终使用 JSON
+        await websocket.send_json({"type": "auth_success", "features": SERVER_FEATURES, **server_answer(codec)})
         
         # 处理消息
         while True:
-            data = await websocket.receive_json()
+            data = await receive_message(websocket, codec)
             
             # 处理查询响应
             if data.get("type") == "query_response":
-                request_id = data.get("request_id")
-                if request_id in pending_requests:
-                    pending_requests[request_id].set_result(data.get("data"))
+                future = pending_requests.get(_pending_key(data.get("request_id"), client_name))
+                if future and not future.done():
+                    # 收到响应时立即记下时间,计算响应时间时不依赖之后才执行的回调
+                    data["received_at"] = asyncio.get_running_loop().time()
+                    await server_instance.resolve_response_icons(websocket, codec, data)
+                    if not future.done():
+                        future.set_result(data)
+            
+            # 处理客户端发回的图标内容
+            elif data.get("type") == "icon_response":
+                server_instance.store_icon(data.get("hash"), data.get("icon"))
             
             # 处理心跳
             elif data.get("type") == "ping":
-                await websocket.send_json({"type": "pong"})
+                await send_message(websocket, codec, {"type": "pong"})
                 
     except WebSocketDisconnect:
         logger.info(f"客户端 {client_name} 断开连接")
     except Exception as e:
         logger.error(f"WebSocket 错误: {e}")
     finally:
-        if client_name and client_name in connected_clients:
+        if client_name and connected_clients.get(client_name) is websocket:
             del connected_clients[client_name]
+            client_codecs.pop(client_name, None)
+            _unindex_tags(client_name)
+
+async def metrics_endpoint(request: Request) -> PlainTextResponse:
+    """
+    Prometheus 指标端点
+
+    指标中带有各节点名称,设置了 MCMOTD_SERVER_TOKEN 时需要在请求头中带上
+    Authorization: Bearer <令牌>(Prometheus 的 authorization 配置)
+    """
+    token = str(server_instance.config.MCMOTD_SERVER_TOKEN or "")
+    if token:
+        scheme, _, credentials = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not hmac.compare_digest(credentials.strip(), token):
+            return PlainTextResponse("未授权", status_code=401, headers={"WWW-Authenticate": "Bearer"})
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
 
 async def start_server(config):
     """启动 FastAPI 服务器"""
@@ -147,6 +521,10 @@ async def start_server(config):
     server_instance = WebSocketServer(config)
     logger.info(f"WebSocket 服务器实例已创建,允许的客户端: {config.MCMOTD_SERVER_ALLOW_NAMES}")
     
+    if config.MCMOTD_SERVER_METRICS:
+        app.add_api_route("/metrics", metrics_endpoint, methods=["GET"])
+        logger.info("已开放 /metrics 指标端点")
+    
     server_config = uvicorn.Config(
         app,
         host="0.0.0.0",
@@ -160,6 +538,10 @@ def get_connected_clients() -> List[str]:
     """获取已连接的客户端列表"""
     return list(connected_clients.keys())
 
+def get_client_tags(client_name: str) -> List[str]:
+    """获取客户端声明的标签"""
+    return sorted(client_tags.get(client_name, set()))
+
 def get_server_instance() -> WebSocketServer:
     """获取服务器实例"""
     return server_instance
\ No newline at end of file
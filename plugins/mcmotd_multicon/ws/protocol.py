@@ -0,0 +1,150 @@
+"""
+主干节点与客户端之间的消息编解码
+
+认证消息始终使用 JSON 文本帧,客户端在认证消息中带上协议版本和支持的编码、压缩方式,
+服务器在 auth_success 中回复选定的方式,之后双方按协商结果收发消息
+- 编码: msgpack(需要安装 msgpack 库) 或 json
+- 压缩: zlib,只压缩超过阈值的消息,小消息不浪费 CPU
+
+二进制帧格式: 1 字节标志位 + 消息体
+不支持协商的旧版本一端不会带上这些字段,此时继续使用 JSON 文本帧
+解码时始终接受 JSON 文本帧,便于逐步升级
+
+查询消息可以带上查询档位(profile),客户端只执行满足档位的最轻量查询,只返回档位需要的字段
+旧版客户端忽略此字段并返回完整结果,主干节点同样可以处理
+"""
+
+import json
+import zlib
+from typing import Any, Dict, Iterable, Optional
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+PROTOCOL_VERSION = 2
+
+SUPPORTED_ENCODINGS = ["msgpack", "json"] if msgpack is not None else ["json"]
+SUPPORTED_COMPRESSIONS = ["zlib"]
+
+# 查询档位
+PROFILE_LATENCY = "latency"  # 只需要延迟,Java 版只发送 ping 包
+PROFILE_MOTD = "latency+motd"  # 延迟以及 MOTD 和图标哈希,用于比较各节点的差异
+PROFILE_FULL = "full"  # 完整状态
+PROFILE_FIELDS = {
+    PROFILE_LATENCY: ("latency", "is_experimental_latency", "latency_stats", "error", "cached"),
+    PROFILE_MOTD: ("latency", "is_experimental_latency", "latency_stats", "motd", "icon", "icon_hash", "error", "cached"),
+    PROFILE_FULL: None
+}
+
+# 二进制帧标志位
+FLAG_COMPRESSED = 0x01
+FLAG_MSGPACK = 0x02
+
+
+class Codec:
+    """按协商结果编解码消息"""
+
+    def __init__(self, encoding: str = "json", compression: Optional[str] = None, compress_threshold: int = 1024):
+        self.encoding = encoding
+        self.compression = compression
+        self.compress_threshold = compress_threshold
+
+    @property
+    def key(self) -> tuple:
+        """编码方式相同的 Codec 产生相同的帧,可用于复用已编码的帧"""
+        return (self.encoding, self.compression, self.compress_threshold)
+
+    @property
+    def binary(self) -> bool:
+        """是否使用二进制帧"""
+        return self.encoding != "json" or self.compression is not None
+
+    def encode(self, message: Dict[str, Any]) -> str | bytes:
+        """编码消息,返回文本帧或二进制帧"""
+        if not self.binary:
+            return json.dumps(message)
+
+        flags = 0
+        if self.encoding == "msgpack":
+            body = msgpack.packb(message, use_bin_type=True)
+            flags |= FLAG_MSGPACK
+        else:
+            body = json.dumps(message).encode()
+
+        if self.compression == "zlib" and len(body) > self.compress_threshold:
+            body = zlib.compress(body)
+            flags |= FLAG_COMPRESSED
+
+        return bytes([flags]) + body
+
+    def decode(self, frame: str | bytes) -> Dict[str, Any]:
+        """解码文本帧或二进制帧"""
+        if isinstance(frame, str):
+            return json.loads(frame)
+
+        flags, body = frame[0], frame[1:]
+        if flags & FLAG_COMPRESSED:
+            body = zlib.decompress(body)
+        if flags & FLAG_MSGPACK:
+            if msgpack is None:
+                raise ValueError("收到 msgpack 消息,但未安装 msgpack 库")
+            return msgpack.unpackb(body, raw=False)
+        return json.loads(body)
+
+
+def _pick(offered: Iterable[str], supported: Iterable[str]) -> Optional[str]:
+    """按对方的偏好顺序选出双方都支持的选项"""
+    supported = set(supported)
+    for option in offered or []:
+        if option in supported:
+            return option
+    return None
+
+
+def client_offer() -> Dict[str, Any]:
+    """客户端认证消息中附带的协商字段"""
+    return {
+        "protocol": PROTOCOL_VERSION,
+        "encodings": SUPPORTED_ENCODINGS,
+        "compressions": SUPPORTED_COMPRESSIONS
+    }
+
+
+def negotiate(auth_data: Dict[str, Any], compress_threshold: int = 1024) -> Codec:
+    """服务器根据客户端的认证消息选定编码,旧版客户端使用 JSON 文本帧"""
+    if not isinstance(auth_data.get("protocol"), int) or auth_data["protocol"] < PROTOCOL_VERSION:
+        return Codec()
+
+    encoding = _pick(auth_data.get("encodings"), SUPPORTED_ENCODINGS) or "json"
+    compression = _pick(auth_data.get("compressions"), SUPPORTED_COMPRESSIONS)
+    return Codec(encoding, compression, compress_threshold)
+
+
+def server_answer(codec: Codec) -> Dict[str, Any]:
+    """服务器在 auth_success 中附带的协商结果"""
+    return {
+        "protocol": PROTOCOL_VERSION,
+        "encoding": codec.encoding,
+        "compression": codec.compression
+    }
+
+
+def codec_from_answer(auth_response: Dict[str, Any], compress_threshold: int = 1024) -> Codec:
+    """客户端根据 auth_success 创建 Codec,旧版服务器使用 JSON 文本帧"""
+    encoding = auth_response.get("encoding", "json")
+    if encoding not in SUPPORTED_ENCODINGS:
+        encoding = "json"
+    compression = auth_response.get("compression")
+    if compression not in SUPPORTED_COMPRESSIONS:
+        compression = None
+    return Codec(encoding, compression, compress_threshold)
+
+
+def project_result(result: Dict[str, Any], profile: Optional[str]) -> Dict[str, Any]:
+    """只保留查询档位需要的字段,未知档位返回完整结果"""
+    fields = PROFILE_FIELDS.get(profile)
+    if fields is None or not isinstance(result, dict):
+        return result
+    return {key: result[key] for key in fields if key in result}
@@ -6,144 +6,361 @@ MCMOTD_SERVER_TOKEN: str | int = ""
 """
 
 import asyncio
+import random
+import time
 import websockets
 import json
+from typing import Dict, List, Optional, Set
+from nonebot import get_plugin_config
 from nonebot.log import logger
 
-from ..utils.motd import query_java_server, query_bedrock_server
+from ..config import Config
+from ..utils.motd import query_java_server, query_java_latency, query_bedrock_server
+from ..func.icon import IconStore
+from .protocol import Codec, PROFILE_LATENCY, client_offer, codec_from_answer, project_result
+from .fastapi_wserver import get_server_instance
 
-client_status = "未连接"
-active_connections = []
+config = get_plugin_config(Config)
 
-async def handle_query_request(websocket, data):
-    """处理服务器发来的查询请求"""
-    request_id = data.get("request_id")
-    query_type = data.get("query_type")
-    address = data.get("address")
+# 已发送过哈希的图标,服务器索取时从这里取出内容
+icon_store = IconStore(config.MCMOTD_ICON_STORE_SIZE)
+
+# 连接保持超过此时长(秒)后断开,重连时重新从最短等待时间开始退避
+STABLE_CONNECTION_SECONDS = 60
+# 中继模式下,向下游转发时使用上游超时时间的这个比例,留出汇总和回传的时间
+RELAY_TIMEOUT_RATIO = 0.8
+# 限制本节点同时探测的地址数量,所有服务器连接共用,批量查询的每个地址各占一个名额
+query_semaphore: Optional[asyncio.Semaphore] = None
+
+class HubConnection:
+    """与一个主干服务器的连接,按认证时协商的编码收发消息"""
+    
+    def __init__(self, websocket, codec: Codec, features: Set[str]):
+        self.websocket = websocket
+        self.codec = codec
+        # 服务器支持的协议特性,旧版服务器不会发送
+        self.features = features
     
-    logger.info(f"收到查询请求: {query_type} {address} (request_id: {request_id})")
+    async def send(self, message: dict):
+        await self.websocket.send(self.codec.encode(message))
     
+    def decode(self, frame: str | bytes) -> dict:
+        return self.codec.decode(frame)
+
+def get_query_semaphore() -> asyncio.Semaphore:
+    """获取查询并发限制信号量"""
+    global query_semaphore
+    if query_semaphore is None:
+        query_semaphore = asyncio.Semaphore(config.MCMOTD_CLIENT_MAX_CONCURRENCY)
+    return query_semaphore
+
+async def dispatch_query_request(connection: HubConnection, data):
+    """处理一个查询请求,作为独立任务运行,并发上限在 run_query 中按地址计算"""
     try:
-        # 根据类型查询服务器
-        if query_type == "java":
+        await handle_query_request(connection, data)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error(f"发送查询响应失败 (request_id: {data.get('request_id')}): {e}")
+
+async def run_query(connection: HubConnection, query_type: str, address: str, profile: Optional[str] = None) -> dict:
+    """
+    执行满足查询档位的最轻量查询,整理为可发送的结果,只保留档位需要的字段
+
+    每个地址的探测占用一个并发名额,批量查询的地址数量再多也不会超过 MCMOTD_CLIENT_MAX_CONCURRENCY,
+    等待中继下游的时间不占用名额
+    """
+    # 根据类型查询服务器
+    async with get_query_semaphore():
+        if query_type == "java" and profile == PROFILE_LATENCY:
+            result = await query_java_latency(address)
+        elif query_type == "java":
             result = await query_java_server(address)
         elif query_type == "bedrock":
             result = await query_bedrock_server(address)
         else:
             raise ValueError(f"未知的查询类型: {query_type}")
-        
-        # 清理不能序列化的字段
-        if "raw" in result:
-            del result["raw"]
-        
-        # 转换 MOTD 为字符串
-        if "motd" in result:
-            motd = result["motd"]
-            if isinstance(motd, dict):
-                result["motd"] = motd.get("text", str(motd))
+    
+    # 清理不能序列化的字段
+    if "raw" in result:
+        del result["raw"]
+    
+    # 转换 MOTD 为字符串
+    if "motd" in result:
+        motd = result["motd"]
+        if isinstance(motd, dict):
+            result["motd"] = motd.get("text", str(motd))
+        else:
+            result["motd"] = str(motd)
+    
+    result = project_result(result, profile)
+    strip_icon(connection, result)
+    return result
+
+def strip_icon(connection: HubConnection, result):
+    """服务器支持图标哈希时只发送哈希,图标内容等服务器索取时再发送"""
+    if "icon_hash" in connection.features and isinstance(result, dict) and result.get("icon"):
+        result["icon_hash"] = icon_store.put(result.pop("icon"))
+
+def is_relay() -> bool:
+    """同时启用服务器和客户端模式并开启中继时,本节点作为中继节点"""
+    return config.MCMOTD_RELAY_ENABLE and config.MCMOTD_ENABLE_SERVER and get_server_instance() is not None
+
+async def relay_query(connection: HubConnection, data: dict) -> List[dict]:
+    """
+    中继模式下把上游的查询转发给连接到本节点的客户端
+
+    上游在查询消息中带有给本节点的超时时间(timeout),向下游转发时按比例缩短,保证结果能在上游截止前送达
+    已经经过的节点记录在 via 中,查询绕回已经过的节点时不再继续转发,避免形成环路
+
+    Returns:
+        各下游客户端的结果,格式与 broadcast_query 的返回值相同
+    """
+    via = data.get("via") or []
+    if config.MCMOTD_CLIENT_NAME in via:
+        logger.warning(f"查询已经过本节点,不再转发: {' -> '.join(via)}")
+        return []
+    
+    upstream_timeout = data.get("timeout") or config.MCMOTD_SERVER_STATUS_TIMEOUT
+    timeout = min(config.MCMOTD_SERVER_STATUS_TIMEOUT, upstream_timeout * RELAY_TIMEOUT_RATIO)
+    message = {key: value for key, value in data.items() if key not in ("request_id", "timeout")}
+    message["via"] = via + [config.MCMOTD_CLIENT_NAME]
+    
+    # 批量查询的耗时与地址数量有关,不使用自适应超时
+    single = "addresses" not in data
+    relayed = await get_server_instance().broadcast_query(
+        message,
+        timeout,
+        adaptive=single and config.MCMOTD_SERVER_ADAPTIVE_TIMEOUT,
+        quorum=config.MCMOTD_SERVER_QUORUM if single else 0
+    )
+    
+    for entry in relayed:
+        items = entry.get("data")
+        for item in (items if isinstance(items, list) else [items]):
+            strip_icon(connection, item)
+    return relayed
+
+async def handle_query_request(connection: HubConnection, data):
+    """
+    处理服务器发来的查询请求
+
+    带有 addresses 字段的是批量查询,所有地址并发查询,结果按地址顺序放在一个列表中返回
+    中继节点同时把查询转发给下游客户端,下游的结果放在 relayed 字段中一并返回
+    """
+    request_id = data.get("request_id")
+    query_type = data.get("query_type")
+    address = data.get("address")
+    addresses = data.get("addresses")
+    # 旧版主干节点不会指定档位,返回完整结果
+    profile = data.get("profile")
+    
+    logger.info(f"收到查询请求: {query_type} {address or addresses} (request_id: {request_id})")
+    
+    relay_task = asyncio.ensure_future(relay_query(connection, data)) if is_relay() else None
+    response = {
+        "type": "query_response",
+        "request_id": request_id
+    }
+    
+    try:
+        try:
+            if addresses is not None:
+                response["data"] = list(await asyncio.gather(
+                    *(run_query(connection, query_type, item, profile) for item in addresses)
+                ))
             else:
-                result["motd"] = str(motd)
-        
-        logger.info(f"查询完成,准备发送响应 (request_id: {request_id})")
-        
-        # 发送响应
-        await websocket.send(json.dumps({
-            "type": "query_response",
-            "request_id": request_id,
-            "data": result
-        }))
-        
-        logger.info(f"响应已发送 (request_id: {request_id})")
+                response["data"] = await run_query(connection, query_type, address, profile)
+            logger.info(f"查询完成,准备发送响应 (request_id: {request_id})")
+        except Exception as e:
+            logger.error(f"处理查询请求失败: {e}")
+            response["error"] = str(e)
         
-    except Exception as e:
-        logger.error(f"处理查询请求失败: {e}")
-        await websocket.send(json.dumps({
-            "type": "query_response",
-            "request_id": request_id,
-            "error": str(e)
-        }))
+        if relay_task is not None:
+            try:
+                response["relayed"] = await relay_task
+            except Exception as e:
+                logger.error(f"转发查询请求失败: {e}")
+    finally:
+        if relay_task is not None:
+            relay_task.cancel()
+    
+    # 发送响应
+    await connection.send(response)
+    logger.info(f"响应已发送 (request_id: {request_id})")
 
-async def connect_to_server(server_url: str, config):
-    """连接到 WebSocket 服务器"""
-    global client_status
+class HubState:
+    """与一个主干服务器的连接状态"""
+    
+    def __init__(self, server_url: str):
+        self.server_url = server_url
+        self.status = "未连接"
+        # 本次连接建立的时间(时间戳),未连接时为 None
+        self.connected_since: Optional[float] = None
+        # 首次连接之后的重连次数
+        self.reconnects = 0
+        # 最近一次心跳的往返时间(毫秒)
+        self.last_rtt: Optional[float] = None
+        # 下一次重连的时间(时间戳)
+        self.retry_at: Optional[float] = None
+        self.ping_sent_at: Optional[float] = None
     
+    @property
+    def connected(self) -> bool:
+        return self.connected_since is not None
+    
+    def mark_connected(self):
+        self.status = "已连接"
+        self.connected_since = time.time()
+        self.retry_at = None
+    
+    def mark_disconnected(self, status: str):
+        self.status = status
+        self.connected_since = None
+        self.ping_sent_at = None
+    
+    def record_pong(self):
+        if self.ping_sent_at is not None:
+            self.last_rtt = (time.monotonic() - self.ping_sent_at) * 1000
+            self.ping_sent_at = None
+
+# 各主干服务器的连接状态,键为服务器地址
+hub_states: Dict[str, HubState] = {}
+
+async def connect_to_server(server_url: str, config, state: HubState) -> Optional[float]:
+    """
+    连接到 WebSocket 服务器,直到连接断开
+
+    Returns:
+        认证成功后保持连接的时长(秒),未能建立连接或认证失败时返回 None
+    """
     uri = f"ws://{server_url}/ws"
     logger.info(f"尝试连接到服务器: {uri}")
+    state.status = "连接中"
+    connected_at = None
     
     try:
-        async with websockets.connect(uri) as websocket:
-            # 发送认证消息
+        # 压缩由协商的编码按消息大小决定,不再使用传输层的整体压缩
+        async with websockets.connect(uri, compression=None) as websocket:
+            # 发送认证消息,附带支持的编码和压缩方式,认证阶段始终使用 JSON
             await websocket.send(json.dumps({
                 "type": "auth",
                 "token": config.MCMOTD_SERVER_TOKEN,
-                "name": config.MCMOTD_CLIENT_NAME
+                "name": config.MCMOTD_CLIENT_NAME,
+                "tags": config.MCMOTD_CLIENT_TAGS,
+                **client_offer()
             }))
             
             # 等待认证响应
             auth_response = json.loads(await websocket.recv())
             if auth_response.get("type") != "auth_success":
                 logger.error(f"认证失败: {auth_response}")
-                return
+                state.status = f"认证失败: {auth_response.get('reason') or auth_response}"
+                return None
             
-            logger.info(f"已连接到服务器: {server_url}")
-            client_status = f"已连接到 {server_url}"
-            active_connections.append(websocket)
+            connection = HubConnection(
+                websocket,
+                codec_from_answer(auth_response, config.MCMOTD_WS_COMPRESS_THRESHOLD),
+                set(auth_response.get("features", []))
+            )
+            
+            logger.info(f"已连接到服务器: {server_url} (编码: {connection.codec.encoding}, 压缩: {connection.codec.compression or '无'})")
+            connected_at = time.monotonic()
+            state.mark_connected()
             
             # 启动心跳任务
-            heartbeat_task = asyncio.create_task(send_heartbeat(websocket))
+            heartbeat_task = asyncio.create_task(send_heartbeat(connection, state))
+            # 正在执行的查询任务,响应按完成顺序发送
+            query_tasks: Set[asyncio.Task] = set()
             
             try:
                 # 处理消息
                 async for message in websocket:
-                    data = json.loads(message)
+                    data = connection.decode(message)
                     logger.debug(f"收到消息: {data.get('type')}")
                     
                     if data.get("type") == "query":
-                        await handle_query_request(websocket, data)
+                        # 每个查询单独成为任务,慢查询不再阻塞心跳和后续查询
+                        task = asyncio.create_task(dispatch_query_request(connection, data))
+                        query_tasks.add(task)
+                        task.add_done_callback(query_tasks.discard)
+                    elif data.get("type") == "icon_request":
+                        digest = data.get("hash")
+                        await connection.send({
+                            "type": "icon_response",
+                            "hash": digest,
+                            "icon": icon_store.get(digest)
+                        })
                     elif data.get("type") == "pong":
-                        pass  # 心跳响应
+                        # 心跳响应,用于计算往返时间
+                        state.record_pong()
                         
             finally:
                 heartbeat_task.cancel()
-                active_connections.remove(websocket)
+                for task in query_tasks:
+                    task.cancel()
+        
+        logger.warning(f"与服务器 {server_url} 的连接已断开")
+        state.mark_disconnected("连接已断开")
                 
     except Exception as e:
         logger.error(f"连接服务器失败 {server_url}: {e}")
-        client_status = f"连接失败: {e}"
+        state.mark_disconnected(f"连接失败: {e}")
+    
+    return time.monotonic() - connected_at if connected_at is not None else None
 
-async def send_heartbeat(websocket):
+async def send_heartbeat(connection: HubConnection, state: HubState):
     """发送心跳消息"""
     try:
         while True:
+            # 连接建立后立即发送一次,尽早得到往返时间
+            state.ping_sent_at = time.monotonic()
+            await connection.send({"type": "ping"})
             await asyncio.sleep(30)
-            await websocket.send(json.dumps({"type": "ping"}))
     except asyncio.CancelledError:
         pass
     except Exception as e:
         logger.error(f"发送心跳失败: {e}")
 
-async def start_client(config):
-    """启动 WebSocket 客户端"""
-    global client_status
+def reconnect_delay(attempt: int, base: float, cap: float) -> float:
+    """
+    计算第 attempt 次(从 0 开始)连续重连前的等待时间
+
+    指数退避并加入随机抖动: 取 min(cap, base * 2^attempt) 的 50%~100%,
+    主干服务器重启后各节点的重连时间会被打散,不会同时涌入
+    """
+    delay = min(cap, base * 2 ** min(attempt, 32))
+    return delay * random.uniform(0.5, 1.0)
+
+async def supervise_hub(server_url: str, config):
+    """独立维护与一个主干服务器的连接,断开后按指数退避重连,不受其他服务器影响"""
+    state = hub_states.setdefault(server_url, HubState(server_url))
+    attempt = 0
     
     while True:
-        try:
-            # 连接到所有服务器
-            tasks = [
-                connect_to_server(server, config)
-                for server in config.MCMOTD_CONNECT_SERVERS
-            ]
-            
-            if tasks:
-                await asyncio.gather(*tasks, return_exceptions=True)
-            
-        except Exception as e:
-            logger.error(f"客户端错误: {e}")
-            client_status = f"错误: {e}"
+        connected_for = await connect_to_server(server_url, config, state)
         
-        # 重连延迟
-        await asyncio.sleep(5)
+        # 连接保持足够久才重置退避,避免反复闪断时频繁重连
+        if connected_for is not None and connected_for >= STABLE_CONNECTION_SECONDS:
+            attempt = 0
+        
+        delay = reconnect_delay(attempt, config.MCMOTD_CLIENT_RECONNECT_MIN, config.MCMOTD_CLIENT_RECONNECT_MAX)
+        attempt += 1
+        state.retry_at = time.time() + delay
+        logger.info(f"{delay:.1f} 秒后重连服务器: {server_url}")
+        await asyncio.sleep(delay)
+        state.reconnects += 1
+
+async def start_client(config):
+    """启动 WebSocket 客户端,每个主干服务器一个独立的连接任务"""
+    await asyncio.gather(*(
+        supervise_hub(server, config)
+        for server in config.MCMOTD_CONNECT_SERVERS
+    ))
 
-def get_client_status() -> str:
-    """获取客户端状态"""
-    return client_status
\ No newline at end of file
+def get_hub_states() -> List[HubState]:
+    """获取各主干服务器的连接状态,按配置顺序排列"""
+    return [
+        hub_states.get(server) or HubState(server)
+        for server in config.MCMOTD_CONNECT_SERVERS
+    ]
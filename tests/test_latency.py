@@ -0,0 +1,46 @@
+"""
+多次采样延迟模块的测试,使用 bench/fake_servers.py 中的假服务器,不需要访问外网
+运行: python -m unittest discover tests
+"""
+
+import importlib.util
+import unittest
+from pathlib import Path
+
+from bench.fake_servers import FakeBedrockServer
+
+# 直接按文件加载,不经过插件的 __init__(那里需要已初始化的 NoneBot)
+_spec = importlib.util.spec_from_file_location(
+    "mcmotd_latency", Path(__file__).resolve().parents[1] / "plugins" / "mcmotd_multicon" / "func" / "latency.py"
+)
+latency = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(latency)
+
+
+class RakNetPingTest(unittest.IsolatedAsyncioTestCase):
+    async def test_all_samples_received_with_interval(self):
+        # 间隔大于往返时间时,第一个 Pong 返回后不能提前结束,最后一个采样也要收到
+        async with FakeBedrockServer() as server:
+            samples = await latency.raknet_ping(server.host, server.port, 5, 0.05, 1.0)
+
+        self.assertEqual(len(samples), 5)
+        self.assertTrue(all(sample is not None for sample in samples), samples)
+        self.assertEqual(server.requests, 5)
+        self.assertEqual(latency.summarize(samples)["loss"], 0)
+
+    async def test_all_samples_received_without_interval(self):
+        async with FakeBedrockServer() as server:
+            samples = await latency.raknet_ping(server.host, server.port, 5, 0, 1.0)
+
+        self.assertTrue(all(sample is not None for sample in samples), samples)
+
+    async def test_lost_samples(self):
+        async with FakeBedrockServer(failure="timeout") as server:
+            samples = await latency.raknet_ping(server.host, server.port, 3, 0.01, 0.2)
+
+        self.assertEqual(samples, [None, None, None])
+        self.assertEqual(latency.summarize(samples)["loss"], 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()